@@ -1,95 +1,44 @@
-import json
 import os
 import sys
 import uuid
 import shutil
-
-# Constants
-NUM_VNETS = 1024
-MAX_UNDERLAY_IP_COMBINATIONS = 1048575
-INITIAL_OUTPUT_DIR = 'split_configs'
-VNET_OUTPUT_DIR = 'vnet_mappings'
-
-if len(sys.argv) != 6:
-    print("Usage: python3 generate_configs.py <NUM_OUTBOUND_ROUTES_PER_ENI> <NUM_VNET_MAPPINGS_PER_ENI> <NUM_ENIS> <DPU_NUMBER> <HOSTNAME>")
-    sys.exit(1)
-
-NUM_OUTBOUND_ROUTES_PER_ENI = int(sys.argv[1])
-NUM_VNET_MAPPINGS_PER_ENI = int(sys.argv[2])
-NUM_ENIS = int(sys.argv[3])
-DPU_NUMBER = int(sys.argv[4])
-HOSTNAME = sys.argv[5]
-
-# Remove previously generated config files and shell script
-if os.path.exists(INITIAL_OUTPUT_DIR):
-    shutil.rmtree(INITIAL_OUTPUT_DIR)
-if os.path.exists(VNET_OUTPUT_DIR):
-    shutil.rmtree(VNET_OUTPUT_DIR)
-if os.path.exists('apply_configs.sh'):
-    os.remove('apply_configs.sh')
-os.makedirs(INITIAL_OUTPUT_DIR, exist_ok=True)
-os.makedirs(VNET_OUTPUT_DIR, exist_ok=True)
-
-def generate_guid():
+import time
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the batch engine falls back to plain Python
+    np = None
+
+import configCommon
+from configCommon import (
+    APPLY_PLAN_FILE,
+    INITIAL_OUTPUT_DIR,
+    MAX_UNDERLAY_IP_COMBINATIONS,
+    NUM_VNETS,
+    VNET_OUTPUT_DIR,
+    get_eni_stems,
+    get_file_name,
+    get_mapping_enis,
+    get_vnet_id,
+    pack_addresses,
+    parse_args,
+    print_format_stats,
+    set_run_parameters,
+    validate_run,
+    write_apply_plan,
+    write_apply_script,
+    write_delta_configs,
+    write_eni_configs,
+    write_json_array,
+)
+
+# Address and GUID policy: 13.x.y.z overlays over the full octet range, 13.132.x.y underlays and random
+# GUIDs. Everything else is shared with GenerateConfig7.py through configCommon.py.
+
+def generate_guid(name):
+    # Random on every run; only generators with deterministic GUIDs use the name
     return str(uuid.uuid4())
 
-def generate_routing_type_table():
-    return [
-        {
-            "DASH_ROUTING_TYPE_TABLE:privatelink": {
-                "items": [
-                    {"action_name": "action1", "action_type": "4_to_6"},
-                    {"action_name": "action2", "action_type": "staticencap", "encap_type": "nvgre", "vni": 300}
-                ]
-            },
-            "OP": "SET"
-        }
-    ]
-
-def generate_vnet_table(vnet_id):
-    vni = 5000 + vnet_id
-    return {
-        f"DASH_VNET_TABLE:Vnet{vnet_id}": {
-            "vni": str(vni),
-            "guid": generate_guid()
-        },
-        "OP": "SET"
-    }
-
-def generate_appliance_table():
-    return [
-        {
-            "DASH_APPLIANCE_TABLE:22": {
-                "sip": "10.201.0.10",
-                "vm_vni": "101"
-            },
-            "OP": "SET"
-        }
-    ]
-
-def generate_eni_table(eni_id, vnet_id):
-    mac_address = f"00:00:00:00:{eni_id:02x}:{eni_id:02x}"
-    return {
-        f"DASH_ENI_TABLE:eni{eni_id}": {
-            "mac_address": mac_address,
-            "underlay_ip": f"13.132.111.{eni_id % 256}",
-            "admin_state": "enabled",
-            "vnet": f"Vnet{vnet_id}",
-            "pl_underlay_sip": "10.201.0.10",
-            "pl_sip_encoding": f"0:0:0:2000:111:{eni_id:02x}::/::ffff:ffff:0:0"
-        },
-        "OP": "SET"
-    }
-
-def generate_route_group_table(eni_id):
-    return {
-        f"DASH_ROUTE_GROUP_TABLE:group_id_eni{eni_id}": {
-            "guid": generate_guid(),
-            "version": "1"
-        },
-        "OP": "SET"
-    }
-
 def generate_route_table(route_id, eni_id, vnet_id):
     ip_second_octet = (route_id // 256) % 256
     ip_third_octet = (route_id // (256 * 256)) % 256
@@ -123,126 +72,103 @@ def generate_vnet_mapping_table(mapping_id, vnet_id):
         "OP": "SET"
     }
 
-# Generate initial config (routing type, appliance, all VNETs, all ENIs, all route groups)
-initial_configs = []
-initial_configs.extend(generate_routing_type_table())
-initial_configs.extend(generate_appliance_table())
-for vnet_id in range(1, NUM_VNETS + 1):
-    initial_configs.append(generate_vnet_table(vnet_id))
-for eni_id in range(1, NUM_ENIS + 1):
-    vnet_id = eni_id if eni_id <= NUM_VNETS else ((eni_id - 1) % NUM_VNETS) + 1
-    initial_configs.append(generate_eni_table(eni_id, vnet_id))
-    initial_configs.append(generate_route_group_table(eni_id))
-with open(os.path.join(INITIAL_OUTPUT_DIR, 'config_part_1.json'), 'w') as f:
-    json.dump(initial_configs, f, indent=2)
-
-# Generate per-ENI combined configs (routes + mappings)
-for eni_id in range(1, NUM_ENIS + 1):
-    vnet_id = eni_id if eni_id <= NUM_VNETS else ((eni_id - 1) % NUM_VNETS) + 1
-    route_configs = [generate_route_table(i, eni_id, vnet_id) for i in range(NUM_OUTBOUND_ROUTES_PER_ENI)]
-    route_configs = [c for c in route_configs if c]
-    mapping_configs = [generate_vnet_mapping_table(i, vnet_id) for i in range(NUM_VNET_MAPPINGS_PER_ENI)]
-    mapping_configs = [c for c in mapping_configs if c]
-    combined_configs = route_configs + mapping_configs
-    with open(os.path.join(INITIAL_OUTPUT_DIR, f'eni_{eni_id}_combined.json'), 'w') as f:
-        json.dump(combined_configs, f, indent=2)
-
-# Generate the shell script to apply the configs
-with open('apply_configs.sh', 'w') as f:
-    f.write(f'''#!/bin/bash
-
-# Ensure sshpass is installed
-if ! command -v sshpass &> /dev/null; then
-    echo "sshpass could not be found, attempting to install..."
-    if [ -f /etc/debian_version ]; then
-        sudo apt-get update && sudo apt-get install -y sshpass
-    elif [ -f /etc/redhat-release ]; then
-        sudo yum install -y sshpass
-    else
-        echo "Please install sshpass manually. Exiting."
-        exit 1
-    fi
-fi
-
-HOST="{HOSTNAME}"
-DPU="{DPU_NUMBER}"
-PORT="8080"
-INITIAL_CONFIG_DIR="split_configs"
-CHUNKSIZE="25000"
-CRM_LOG="crm_apply_timings.csv"
-PASSWORD="YourPaSsWoRd"
-HOST_USER="admin"
-DPU_USER="admin"
-DPU_IP="169.254.200.{DPU_NUMBER + 1}"
-
-DPU_COMMAND_ROUTES='sonic-db-cli COUNTERS_DB HGET "CRM:STATS" "crm_stats_dash_ipv4_outbound_routing_used"'
-DPU_COMMAND_MAPPINGS='sonic-db-cli COUNTERS_DB HGET "CRM:STATS" "crm_stats_dash_ipv4_outbound_ca_to_pa_used"'
-
-trap 'echo "Interrupt received, stopping..."; exit 1' INT
-
-echo "CRM Apply Timings" > "$CRM_LOG"
-echo "ENI_ID,ROUTES_EXPECTED,ROUTES_APPLIED_TIME_SEC,MAPPINGS_EXPECTED,MAPPINGS_APPLIED_TIME_SEC" >> "$CRM_LOG"
-
-echo "Applying initial configuration..."
-./gnmi-configurator --host "$HOST" --dpu "$DPU" --port "$PORT" --json "$INITIAL_CONFIG_DIR/config_part_1.json" --chunksize "$CHUNKSIZE"
-
-check_route_mappings() {{
-    local expected_value=$1
-    OUTPUT=$(sshpass -p "$PASSWORD" ssh -o StrictHostKeyChecking=no ${{HOST_USER}}@${{HOST}} \
-        "sshpass -p '$PASSWORD' ssh -o StrictHostKeyChecking=no ${{DPU_USER}}@${{DPU_IP}} \"$DPU_COMMAND_ROUTES\"" \
-    2>/dev/null | tr -d '\r')
-    echo "[CRM ROUTES] Received: $OUTPUT, Expected: $expected_value"
-    if [ "$OUTPUT" == "$expected_value" ]; then
-        return 0
-    else
-        return 1
-    fi
-}}
-
-check_ca2pa_mappings() {{
-    local expected_value=$1
-    OUTPUT=$(sshpass -p "$PASSWORD" ssh -o StrictHostKeyChecking=no ${{HOST_USER}}@${{HOST}} \
-        "sshpass -p '$PASSWORD' ssh -o StrictHostKeyChecking=no ${{DPU_USER}}@${{DPU_IP}} \"$DPU_COMMAND_MAPPINGS\"" \
-    2>/dev/null | tr -d '\r')
-    echo "[CRM MAPPINGS] Received: $OUTPUT, Expected: $expected_value"
-    if [ "$OUTPUT" == "$expected_value" ]; then
-        return 0
-    else
-        return 1
-    fi
-}}
-
-echo "Applying per-ENI configs and measuring timing..."
-expected_routes=0
-expected_mappings=0
-total_all_eni_time=0
-for eni_id in $(seq 1 {NUM_ENIS}); do
-    config_file="$INITIAL_CONFIG_DIR/eni_${{eni_id}}_combined.json"
-    echo "Applying $config_file..."
-    start_time=$(date +%s)
-    ./gnmi-configurator --host "$HOST" --dpu "$DPU" --port "$PORT" --json "$config_file" --chunksize "$CHUNKSIZE"
-    expected_routes=$((expected_routes + {NUM_OUTBOUND_ROUTES_PER_ENI}))
-    expected_mappings=$((expected_mappings + {NUM_VNET_MAPPINGS_PER_ENI}))
-    while true; do
-        route_ok=1
-        mapping_ok=1
-        check_route_mappings $expected_routes && route_ok=0
-        check_ca2pa_mappings $expected_mappings && mapping_ok=0
-        if [ $route_ok -eq 0 ] && [ $mapping_ok -eq 0 ]; then
-            break
-        fi
-        echo "Waiting for both route and mapping counters to reach expected values for ENI $eni_id..."
-        sleep 2
-    done
-    end_time=$(date +%s)
-    total_time=$((end_time - start_time))
-    total_all_eni_time=$((total_all_eni_time + total_time))
-    echo "ENI $eni_id: Both counters reached expected values in $total_time seconds."
-    echo "$eni_id,$expected_routes,$expected_routes,$expected_mappings,$expected_mappings,$total_time" >> "$CRM_LOG"
-done
-
-echo "Total time for all ENIs: $total_all_eni_time seconds."
-echo "All configurations applied successfully. Timing results in $CRM_LOG."
-''')
-os.chmod('apply_configs.sh', 0o755)
-print("Generated 'apply_configs.sh' to apply the configurations and log CRM timing.")
+# The same addresses for the batch engine, a block of entry ids at a time
+MAPPING_FORMAT = {
+    "DASH_VNET_MAPPING_TABLE:Vnet%s:13.%d.%d.%d": {
+        "routing_type": "privatelink",
+        "underlay_ip": "13.132.%d.%d"
+    },
+    "OP": "SET"
+}
+
+def overlay_octets(start, stop):
+    """Second, third and last octets of the 13.x.y.z prefix of route/mapping ids [start, stop)."""
+    if np is not None:
+        ids = np.arange(start, stop, dtype=np.int64)
+        return (ids // 256) % 256, (ids // (256 * 256)) % 256, ids % 256
+    ids = range(start, stop)
+    return [(i // 256) % 256 for i in ids], [(i // (256 * 256)) % 256 for i in ids], [i % 256 for i in ids]
+
+def underlay_octets(start, stop):
+    """Third and last octets of the 13.132.x.y underlay IP of mapping ids [start, stop)."""
+    if np is not None:
+        underlay_ip_ids = np.arange(start, stop, dtype=np.int64) % MAX_UNDERLAY_IP_COMBINATIONS
+        return (underlay_ip_ids // (256 * 256)) % 256, underlay_ip_ids % 256
+    underlay_ip_ids = [i % MAX_UNDERLAY_IP_COMBINATIONS for i in range(start, stop)]
+    return [(u // (256 * 256)) % 256 for u in underlay_ip_ids], [u % 256 for u in underlay_ip_ids]
+
+def mapping_ir_arrays(start, stop):
+    """Overlay and underlay addresses of mapping ids [start, stop)."""
+    return pack_addresses(13, *overlay_octets(start, stop)), pack_addresses(13, 132, *underlay_octets(start, stop))
+
+def get_changed_mappings(old_mappings, old_enis):
+    """Kept mapping ids [start, stop) whose content a delta has to send again: none, as addresses only
+    depend on the mapping id."""
+    return 0, 0
+
+def iter_eni_configs(eni_id, num_routes, num_mappings):
+    """Lazily yields the entries of eni_<id>_combined: its routes, then its VNET's mappings if it is the first ENI on it."""
+    vnet_id = get_vnet_id(eni_id)
+    for route_id in range(num_routes):
+        config = generate_route_table(route_id, eni_id, vnet_id)
+        if config:
+            yield config
+    if eni_id <= NUM_VNETS:
+        for mapping_id in range(num_mappings):
+            config = generate_vnet_mapping_table(mapping_id, vnet_id)
+            if config:
+                yield config
+
+def iter_initial_configs(num_enis):
+    """Lazily yields the initial config (routing type, appliance, VNETs, ENIs and route groups) with this script's GUIDs."""
+    return configCommon.iter_initial_configs(num_enis, generate_guid)
+
+def main(argv=None):
+    """Generates the configs (or a delta) and apply_configs.sh for the command line parameters."""
+    args = parse_args(argv)
+    set_run_parameters(args)
+    configCommon.set_policy(sys.modules[__name__])
+
+    if args.validate:
+        return 1 if validate_run() else 0
+
+    # Remove previously generated config files and shell script (a delta run leaves them alone)
+    if args.delta_from is None:
+        if os.path.exists(INITIAL_OUTPUT_DIR):
+            shutil.rmtree(INITIAL_OUTPUT_DIR)
+        if os.path.exists(VNET_OUTPUT_DIR):
+            shutil.rmtree(VNET_OUTPUT_DIR)
+        for script_file in ('apply_configs.sh', APPLY_PLAN_FILE):
+            if os.path.exists(script_file):
+                os.remove(script_file)
+        os.makedirs(INITIAL_OUTPUT_DIR, exist_ok=True)
+        os.makedirs(VNET_OUTPUT_DIR, exist_ok=True)
+
+    if args.delta_from is not None:
+        write_delta_configs(*args.delta_from)
+        return
+
+    # Generate initial config once, so every format carries the same (random) GUIDs
+    initial_configs = list(iter_initial_configs(args.num_enis))
+
+    # Write the initial config and the per-ENI combined configs (routes + mappings, stamped out of
+    # templates rendered once per format) in every requested format, timing each format
+    eni_ids = list(range(1, args.num_enis + 1))
+    mapping_enis = get_mapping_enis(eni_ids)
+    format_stats = []
+    for output_format in configCommon.OUTPUT_FORMATS:
+        start_time = time.time()
+        write_json_array(os.path.join(INITIAL_OUTPUT_DIR, get_file_name('config_part_1', output_format)), initial_configs, output_format)
+        write_eni_configs(eni_ids, mapping_enis, output_format)
+        file_names = [get_file_name('config_part_1', output_format)]
+        for eni_id in eni_ids:
+            file_names += [get_file_name(stem, output_format) for stem in get_eni_stems(eni_id, eni_id in mapping_enis)]
+        size = sum(os.path.getsize(os.path.join(INITIAL_OUTPUT_DIR, name)) for name in file_names)
+        format_stats.append((output_format, size, time.time() - start_time))
+    print_format_stats(format_stats)
+
+    write_apply_script('counters')
+    write_apply_plan('counters')
+
+if __name__ == '__main__':
+    sys.exit(main())
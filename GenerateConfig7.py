@@ -1,101 +1,56 @@
+import hashlib
 import json
 import os
 import sys
 import uuid
 import shutil
+import time
 
-# Constants
-NUM_VNETS = 1024
-MAX_UNDERLAY_IP_COMBINATIONS = 1048575
-INITIAL_OUTPUT_DIR = 'split_configs'
-VNET_OUTPUT_DIR = 'vnet_mappings'
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the batch engine falls back to plain Python
+    np = None
 
-# Argument parsing
+import configCommon
+from configCommon import (
+    APPLY_PLAN_FILE,
+    INITIAL_OUTPUT_DIR,
+    MAX_UNDERLAY_IP_COMBINATIONS,
+    NUM_VNETS,
+    TEMPLATE_READ_SIZE,
+    VNET_OUTPUT_DIR,
+    get_eni_stems,
+    get_file_name,
+    get_mapping_enis,
+    get_vnet_id,
+    pack_addresses,
+    parse_args,
+    print_format_stats,
+    publish_file,
+    set_run_parameters,
+    validate_run,
+    write_apply_plan,
+    write_apply_script,
+    write_delta_configs,
+    write_eni_configs,
+    write_json_array,
+)
+
+MANIFEST_FILE = 'manifest.json'
+# Bump whenever the content generated for unchanged parameters changes, to invalidate cached files
+GENERATOR_VERSION = 1
+
+# Run parameters of this generator on top of configCommon's; main() sets them from the command line
 GENERATE_CONFIGS = False
-args = sys.argv[1:]
-if '--generate-configs' in args:
-    GENERATE_CONFIGS = True
-    args.remove('--generate-configs')
-if len(args) != 5:
-    print("Usage: python3 generate_configs.py <NUM_OUTBOUND_ROUTES_PER_ENI> <NUM_VNET_MAPPINGS_PER_ENI> <NUM_ENIS> <DPU_NUMBER> <HOSTNAME> [--generate-configs]")
-    sys.exit(1)
-
-NUM_OUTBOUND_ROUTES_PER_ENI = int(args[0])
-NUM_VNET_MAPPINGS_PER_ENI = int(args[1])
-NUM_ENIS = int(args[2])
-DPU_NUMBER = int(args[3])
-HOSTNAME = args[4]
-
-# Remove previously generated config files and shell script
-if GENERATE_CONFIGS:
-    if os.path.exists(INITIAL_OUTPUT_DIR):
-        shutil.rmtree(INITIAL_OUTPUT_DIR)
-    if os.path.exists(VNET_OUTPUT_DIR):
-        shutil.rmtree(VNET_OUTPUT_DIR)
-    os.makedirs(INITIAL_OUTPUT_DIR, exist_ok=True)
-    os.makedirs(VNET_OUTPUT_DIR, exist_ok=True)
-if os.path.exists('apply_configs.sh'):
-    os.remove('apply_configs.sh')
-
-def generate_guid():
-    return str(uuid.uuid4())
-
-def generate_routing_type_table():
-    return [
-        {
-            "DASH_ROUTING_TYPE_TABLE:privatelink": {
-                "items": [
-                    {"action_name": "action1", "action_type": "4_to_6"},
-                    {"action_name": "action2", "action_type": "staticencap", "encap_type": "nvgre", "vni": 300}
-                ]
-            },
-            "OP": "SET"
-        }
-    ]
-
-def generate_vnet_table(vnet_id):
-    vni = 5000 + vnet_id
-    return {
-        f"DASH_VNET_TABLE:Vnet{vnet_id}": {
-            "vni": str(vni),
-            "guid": generate_guid()
-        },
-        "OP": "SET"
-    }
+GUID_SEED = 0
 
-def generate_appliance_table():
-    return [
-        {
-            "DASH_APPLIANCE_TABLE:22": {
-                "sip": "10.201.0.10",
-                "vm_vni": "101"
-            },
-            "OP": "SET"
-        }
-    ]
-
-def generate_eni_table(eni_id, vnet_id):
-    mac_address = f"00:00:00:00:{eni_id:02x}:{eni_id:02x}"
-    return {
-        f"DASH_ENI_TABLE:eni{eni_id}": {
-            "mac_address": mac_address,
-            "underlay_ip": f"13.132.111.{eni_id % 256}",
-            "admin_state": "enabled",
-            "vnet": f"Vnet{vnet_id}",
-            "pl_underlay_sip": "10.201.0.10",
-            "pl_sip_encoding": f"0:0:0:2000:111:{eni_id:02x}::/::ffff:ffff:0:0"
-        },
-        "OP": "SET"
-    }
+# Address and GUID policy: 13.x.y.z overlays and 10.x.y.z underlays over octets 1-254, falling back to
+# the shared 11.254.254.254 underlay past get_max_combinations(), and GUIDs derived from GUID_SEED.
+# Everything else is shared with GenerateConfig.py through configCommon.py.
 
-def generate_route_group_table(eni_id):
-    return {
-        f"DASH_ROUTE_GROUP_TABLE:group_id_eni{eni_id}": {
-            "guid": generate_guid(),
-            "version": "1"
-        },
-        "OP": "SET"
-    }
+def generate_guid(name):
+    # Deterministic per object and seed, so cached and freshly generated files agree
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"dash-config:{GUID_SEED}:{name}"))
 
 def generate_route_table(route_id, eni_id, vnet_id):
     # Use only 1-254 for each octet to avoid invalid/broadcast IPs
@@ -112,7 +67,7 @@ def generate_route_table(route_id, eni_id, vnet_id):
         "OP": "SET"
     }
 
-def generate_vnet_mapping_table(mapping_id, vnet_id):
+def generate_vnet_mapping_table(mapping_id, vnet_id, num_enis=None):
     # Use only 1-254 for each octet to avoid invalid/broadcast IPs
     ip_second_octet = 1 + ((mapping_id // (254 * 254)) % 254)  # 1-254
     ip_third_octet = 1 + ((mapping_id // 254) % 254)           # 1-254
@@ -120,7 +75,7 @@ def generate_vnet_mapping_table(mapping_id, vnet_id):
     if ip_second_octet > 254 or ip_third_octet > 254 or ip_last_octet > 254:
         return None
     # For underlay IPs, after reaching the max, use a single common IP
-    max_combinations = min(254 * 254 * 254, MAX_UNDERLAY_IP_COMBINATIONS // NUM_ENIS)
+    max_combinations = get_max_combinations(configCommon.NUM_ENIS if num_enis is None else num_enis)
     if mapping_id < max_combinations:
         underlay_ip = f"10.{ip_second_octet}.{ip_third_octet}.{ip_last_octet}"
     else:
@@ -133,125 +88,240 @@ def generate_vnet_mapping_table(mapping_id, vnet_id):
         "OP": "SET"
     }
 
-if GENERATE_CONFIGS:
-    # Generate initial config (routing type, appliance, all VNETs, all ENIs, all route groups)
-    initial_configs = []
-    initial_configs.extend(generate_routing_type_table())
-    initial_configs.extend(generate_appliance_table())
-    for vnet_id in range(1, NUM_VNETS + 1):
-        initial_configs.append(generate_vnet_table(vnet_id))
-    for eni_id in range(1, NUM_ENIS + 1):
-        vnet_id = eni_id if eni_id <= NUM_VNETS else ((eni_id - 1) % NUM_VNETS) + 1
-        initial_configs.append(generate_eni_table(eni_id, vnet_id))
-        initial_configs.append(generate_route_group_table(eni_id))
-    with open(os.path.join(INITIAL_OUTPUT_DIR, 'config_part_1.json'), 'w') as f:
-        json.dump(initial_configs, f, indent=2)
-
-    # Generate per-ENI combined configs (routes + mappings)
-    for eni_id in range(1, NUM_ENIS + 1):
-        vnet_id = eni_id if eni_id <= NUM_VNETS else ((eni_id - 1) % NUM_VNETS) + 1
-        route_configs = [generate_route_table (i, eni_id, vnet_id) for i in range(NUM_OUTBOUND_ROUTES_PER_ENI)]
-        route_configs = [c for c in route_configs if c]
-        mapping_configs = [generate_vnet_mapping_table(i, vnet_id) for i in range(NUM_VNET_MAPPINGS_PER_ENI)]
-        mapping_configs = [c for c in mapping_configs if c]
-        combined_configs = route_configs + mapping_configs
-        with open(os.path.join(INITIAL_OUTPUT_DIR, f'eni_{eni_id}_combined.json'), 'w') as f:
-            json.dump(combined_configs, f, indent=2)
-
-# Generate the shell script to apply the configs
-with open('apply_configs.sh', 'w') as f:
-    f.write('''#!/bin/bash
-
-# Ensure sshpass is installed
-if ! command -v sshpass &> /dev/null; then
-    echo "sshpass could not be found, attempting to install..."
-    if [ -f /etc/debian_version ]; then
-        sudo apt-get update && sudo apt-get install -y sshpass
-    elif [ -f /etc/redhat-release ]; then
-        sudo yum install -y sshpass
-    else
-        echo "Please install sshpass manually. Exiting."
-        exit 1
-    fi
-fi
-
-HOST="{HOSTNAME}"
-DPU="{DPU_NUMBER}"
-PORT="8080"
-INITIAL_CONFIG_DIR="split_configs"
-CHUNKSIZE="25000"
-CRM_LOG="crm_apply_timings.csv"
-PASSWORD="YourPaSsWoRd"
-HOST_USER="admin"
-DPU_USER="admin"
-DPU_IP="169.254.200.{dpu_ip_last_octet}"
-DPU_SSH_PORT=$((5021 + {DPU_NUMBER}))
-
-DPU_COMMAND_ROUTES='sonic-db-cli COUNTERS_DB HGET "CRM:STATS" "crm_stats_dash_ipv4_outbound_routing_used"'
-DPU_COMMAND_MAPPINGS='sonic-db-cli COUNTERS_DB HGET "CRM:STATS" "crm_stats_dash_ipv4_outbound_ca_to_pa_used"'
-
-trap 'echo "Interrupt received, stopping..."; exit 1' INT
-
-echo "CRM Apply Timings" > "$CRM_LOG"
-echo "ENI_ID,ROUTES_EXPECTED,ROUTES_APPLIED_TIME_SEC,MAPPINGS_EXPECTED,MAPPINGS_APPLIED_TIME_SEC,TOTAL_TIME_SEC" >> "$CRM_LOG"
-
-echo "Applying initial configuration..."
-./gnmi-configurator --host "$HOST" --dpu "$DPU" --port "$PORT" --json "$INITIAL_CONFIG_DIR/config_part_1.json" --chunksize "$CHUNKSIZE"
-
-#check_route_mappings() {{
-#    local expected_value=$1
-#    local cmd="sshpass -p '$PASSWORD' ssh -T -n -o LogLevel=ERROR -o StrictHostKeyChecking=no -o PubkeyAuthentication=no -o PreferredAuthentications=password ${{DPU_USER}}@${{HOST}} \"$DPU_COMMAND_ROUTES\""
-#    OUTPUT=$(sshpass -p "$PASSWORD" ssh -T -n -o LogLevel=ERROR -o StrictHostKeyChecking=no -o PubkeyAuthentication=no -o PreferredAuthentications=password ${{HOST_USER}}@${{HOST}} "$cmd" 2>&1 | tr -d '\r')
-#    echo "[CRM ROUTES] Received: $OUTPUT, Expected: $expected_value"
-#    if [ "$OUTPUT" == "$expected_value" ]; then
-#        return 0
-#    else
-#        return 1
-#    fi
-#}}
-
-#check_ca2pa_mappings() {{
-#    local expected_value=$1
-#    local cmd="sshpass -p '$PASSWORD' ssh -T -n -o LogLevel=ERROR -o StrictHostKeyChecking=no -o PubkeyAuthentication=no -o PreferredAuthentications=password ${{DPU_USER}}@${{HOST}} \"$DPU_COMMAND_MAPPINGS\""
-#    OUTPUT=$(sshpass -p "$PASSWORD" ssh -T -n -o LogLevel=ERROR -o StrictHostKeyChecking=no -o PubkeyAuthentication=no -o PreferredAuthentications=password ${{HOST_USER}}@${{HOST}} "$cmd" 2>&1 | tr -d '\r')
-#    echo "[CRM MAPPINGS] Received: $OUTPUT, Expected: $expected_value"
-#    if [ "$OUTPUT" == "$expected_value" ]; then
-#        return 0
-#    else
-#        return 1
-#    fi
-#}}
-
-#run_on_dpu() {{
-#    local cmd="$1"
-#    sshpass -p "$PASSWORD" ssh -o StrictHostKeyChecking=no -o PubkeyAuthentication=no -o PreferredAuthentications=password ${{HOST_USER}}@${{HOST}} \
-#        "sshpass -p '$PASSWORD' ssh -o StrictHostKeyChecking=no -o PubkeyAuthentication=no -o PreferredAuthentications=password ${{DPU_USER}}@${{HOST}} \"$cmd\"" 2>/dev/null | tr -d '\r'
-#}}
-
-echo "Applying per-ENI configs..."
-for eni_id in $(seq 1 {NUM_ENIS}); do
-    config_file="$INITIAL_CONFIG_DIR/eni_${{eni_id}}_combined.json"
-    echo "Applying $config_file..."
-    ./gnmi-configurator --host "$HOST" --dpu "$DPU" --port "$PORT" --json "$config_file" --chunksize "$CHUNKSIZE"
-    while true; do
-        log_found=$(sshpass -p "$PASSWORD" ssh -T -n -p $DPU_SSH_PORT -o LogLevel=ERROR -o StrictHostKeyChecking=no -o PubkeyAuthentication=no -o PreferredAuthentications=password ${{DPU_USER}}@${{HOST}} "grep -E 'ENI ${{eni_id}} COMPLETED.*' /home/admin/eni_summary.log")
-        if [[ -n "$log_found" ]]; then
-            echo "ENI $eni_id COMPLETED log found on DPU."
-            break
-        fi
-        echo "Waiting for ENI $eni_id COMPLETED log on DPU..."
-        sleep 5
-    done
-done
-
-echo "All configurations applied successfully."
-'''.format(
-        HOSTNAME=HOSTNAME,
-        DPU_NUMBER=DPU_NUMBER,
-        NUM_ENIS=NUM_ENIS,
-        NUM_OUTBOUND_ROUTES_PER_ENI=NUM_OUTBOUND_ROUTES_PER_ENI,
-        NUM_VNET_MAPPINGS_PER_ENI=NUM_VNET_MAPPINGS_PER_ENI,
-        dpu_ip_last_octet=DPU_NUMBER + 1
-    ))
-os.chmod('apply_configs.sh', 0o755)
-print("Generated 'apply_configs.sh' to apply the configurations and log CRM timing.")
+# The same addresses for the batch engine, a block of entry ids at a time
+MAPPING_FORMAT = {
+    "DASH_VNET_MAPPING_TABLE:Vnet%s:13.%d.%d.%d": {
+        "routing_type": "privatelink",
+        "underlay_ip": "%d.%d.%d.%d"
+    },
+    "OP": "SET"
+}
+
+def overlay_octets(start, stop):
+    """1-254 second, third and last octets of the 13.x.y.z prefix of route/mapping ids [start, stop)."""
+    if np is not None:
+        ids = np.arange(start, stop, dtype=np.int64)
+        return 1 + (ids // (254 * 254)) % 254, 1 + (ids // 254) % 254, 1 + ids % 254
+    ids = range(start, stop)
+    return [1 + (i // (254 * 254)) % 254 for i in ids], [1 + (i // 254) % 254 for i in ids], [1 + i % 254 for i in ids]
+
+def get_max_combinations(num_enis):
+    """Mapping id from which generate_vnet_mapping_table() falls back to the shared 11.254.254.254."""
+    return min(254 * 254 * 254, MAX_UNDERLAY_IP_COMBINATIONS // num_enis) if num_enis else 254 * 254 * 254
+
+def underlay_octets(start, stop):
+    """Octets of the underlay IP of mapping ids [start, stop); ids past max_combinations share 11.254.254.254."""
+    max_combinations = get_max_combinations(configCommon.NUM_ENIS)
+    second, third, last = overlay_octets(start, stop)
+    if np is not None:
+        shared = np.arange(start, stop, dtype=np.int64) >= max_combinations
+        return np.where(shared, 11, 10), np.where(shared, 254, second), np.where(shared, 254, third), np.where(shared, 254, last)
+    shared = [i >= max_combinations for i in range(start, stop)]
+    return ([11 if s else 10 for s in shared], [254 if s else o for s, o in zip(shared, second)],
+            [254 if s else o for s, o in zip(shared, third)], [254 if s else o for s, o in zip(shared, last)])
+
+def mapping_ir_arrays(start, stop):
+    """Overlay and underlay addresses of mapping ids [start, stop)."""
+    return pack_addresses(13, *overlay_octets(start, stop)), pack_addresses(*underlay_octets(start, stop))
+
+def get_changed_mappings(old_mappings, old_enis):
+    """Kept mapping ids [start, stop) whose content a delta has to send again: the 11.254.254.254 fallback
+    point moves with NUM_ENIS, which changes the underlay of the mappings between the old and new one."""
+    fallback_points = (get_max_combinations(old_enis), get_max_combinations(configCommon.NUM_ENIS))
+    return min(fallback_points), min(max(fallback_points), old_mappings, configCommon.NUM_VNET_MAPPINGS_PER_ENI)
+
+def iter_eni_configs(eni_id, num_routes, num_mappings, num_enis):
+    """Lazily yields the entries of eni_<id>_combined: its routes, then its VNET's mappings if it is the first ENI on it.
+
+    num_enis is the run's ENI count, which decides where mapping underlays fall back to 11.254.254.254.
+    """
+    vnet_id = get_vnet_id(eni_id)
+    for route_id in range(num_routes):
+        config = generate_route_table(route_id, eni_id, vnet_id)
+        if config:
+            yield config
+    if eni_id <= NUM_VNETS:
+        for mapping_id in range(num_mappings):
+            config = generate_vnet_mapping_table(mapping_id, vnet_id, num_enis)
+            if config:
+                yield config
+
+def iter_initial_configs(num_enis):
+    """Lazily yields the initial config (routing type, appliance, VNETs, ENIs and route groups) with this script's GUIDs."""
+    return configCommon.iter_initial_configs(num_enis, generate_guid)
+
+def hash_file(path):
+    """Hex sha256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(TEMPLATE_READ_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def publish_hashed_file(tmp_path, name):
+    """publish_file(), plus the sha256 that is_unchanged() checks a cached file against."""
+    sha256 = hash_file(tmp_path)
+    return {"sha256": sha256, **publish_file(tmp_path, name)}
+
+def get_expected_files(mapping_enis):
+    """Maps each file of this run to a digest of the inputs that fully determine its content."""
+    max_combinations = get_max_combinations(configCommon.NUM_ENIS)
+    inputs = {}
+    for output_format in configCommon.OUTPUT_FORMATS:
+        inputs[get_file_name('config_part_1', output_format)] = {
+            "enis": configCommon.NUM_ENIS, "vnets": NUM_VNETS, "guid_seed": GUID_SEED, "format": output_format}
+        for eni_id in range(1, configCommon.NUM_ENIS + 1):
+            mappings = configCommon.NUM_VNET_MAPPINGS_PER_ENI if eni_id in mapping_enis else 0
+            for index, stem in enumerate(get_eni_stems(eni_id, eni_id in mapping_enis), 1):
+                inputs[get_file_name(stem, output_format)] = {
+                    "eni": eni_id,
+                    "vnet": get_vnet_id(eni_id),
+                    "routes": configCommon.NUM_OUTBOUND_ROUTES_PER_ENI,
+                    "mappings": mappings,
+                    # Where mappings fall back to 11.254.254.254 depends on NUM_ENIS, but only matters once reached
+                    "shared_underlay_from": max_combinations if mappings > max_combinations else None,
+                    "format": output_format,
+                    "chunk_size": configCommon.CHUNK_SIZE,
+                    "chunk": index
+                }
+    return {
+        name: hashlib.sha256(json.dumps([GENERATOR_VERSION, file_inputs], sort_keys=True).encode()).hexdigest()
+        for name, file_inputs in inputs.items()
+    }
+
+def load_manifest():
+    """Returns the manifest of the last --generate-configs run, or an empty one."""
+    try:
+        with open(os.path.join(INITIAL_OUTPUT_DIR, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"files": {}}
+
+def save_manifest(files):
+    """Atomically records the run parameters and the per-file inputs digest, sha256, size and mtime."""
+    path = os.path.join(INITIAL_OUTPUT_DIR, MANIFEST_FILE)
+    manifest = {
+        "parameters": {
+            "routes_per_eni": configCommon.NUM_OUTBOUND_ROUTES_PER_ENI,
+            "mappings_per_eni": configCommon.NUM_VNET_MAPPINGS_PER_ENI,
+            "enis": configCommon.NUM_ENIS,
+            "guid_seed": GUID_SEED,
+            "generator_version": GENERATOR_VERSION
+        },
+        "files": files
+    }
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+def is_unchanged(path, entry):
+    """Whether the file at path still has the content its manifest entry recorded."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return False
+    if stat.st_size != entry["size"]:
+        return False
+    # A file untouched since it was written (same size and mtime) is trusted without re-reading it
+    if stat.st_mtime_ns == entry.get("mtime_ns"):
+        return True
+    if hash_file(path) != entry["sha256"]:
+        return False
+    entry["mtime_ns"] = stat.st_mtime_ns # Same content, just touched: skip the hash next time
+    return True
+
+def get_stale_files(expected_files, cached_files):
+    """Returns the expected files that are uncached, were built from other inputs, or changed on disk."""
+    stale = set()
+    for name, inputs_digest in expected_files.items():
+        entry = cached_files.get(name)
+        if not entry or entry["inputs"] != inputs_digest or not is_unchanged(os.path.join(INITIAL_OUTPUT_DIR, name), entry):
+            stale.add(name)
+    return stale
+
+def add_arguments(parser):
+    """Adds the options of the cached generation to configCommon's command line."""
+    parser.add_argument('--generate-configs', action='store_true',
+                        help="(Re)generate the split_configs/ files whose inputs changed since the last run.")
+    parser.add_argument('--clean', action='store_true', help="With --generate-configs, discard all cached files first.")
+    parser.add_argument('--guid-seed', type=int, default=0, help="Seed for the deterministic VNET/route group GUIDs.")
+
+def main(argv=None):
+    """Generates the configs (or a delta) and apply_configs.sh for the command line parameters."""
+    global GENERATE_CONFIGS, GUID_SEED
+    args = parse_args(argv, add_arguments)
+    set_run_parameters(args)
+    configCommon.set_policy(sys.modules[__name__])
+    GENERATE_CONFIGS = args.generate_configs
+    GUID_SEED = args.guid_seed
+
+    if args.validate:
+        return 1 if validate_run() else 0
+
+    # Remove the shell script and, with --clean, all previously generated config files (a delta run leaves them alone)
+    if GENERATE_CONFIGS and args.delta_from is None:
+        if args.clean and os.path.exists(INITIAL_OUTPUT_DIR):
+            shutil.rmtree(INITIAL_OUTPUT_DIR)
+        if args.clean and os.path.exists(VNET_OUTPUT_DIR):
+            shutil.rmtree(VNET_OUTPUT_DIR)
+        os.makedirs(INITIAL_OUTPUT_DIR, exist_ok=True)
+        os.makedirs(VNET_OUTPUT_DIR, exist_ok=True)
+    if args.delta_from is None:
+        for script_file in ('apply_configs.sh', APPLY_PLAN_FILE):
+            if os.path.exists(script_file):
+                os.remove(script_file)
+
+    if args.delta_from is not None:
+        write_delta_configs(*args.delta_from)
+        return
+
+    mapping_enis = get_mapping_enis(range(1, args.num_enis + 1))
+    expected_files = get_expected_files(mapping_enis)
+    cached_files = load_manifest()["files"]
+    stale_files = get_stale_files(expected_files, cached_files)
+
+    if GENERATE_CONFIGS:
+        # Only files whose inputs changed are rewritten; the rest are reused from the last run
+        files = {name: cached_files[name] for name in expected_files if name not in stale_files}
+        for name in cached_files.keys() - expected_files.keys():
+            # Left over from a run with more ENIs
+            if os.path.exists(os.path.join(INITIAL_OUTPUT_DIR, name)):
+                os.remove(os.path.join(INITIAL_OUTPUT_DIR, name))
+
+        # Write the stale files of every requested format, timing each format
+        format_stats = []
+        for output_format in configCommon.OUTPUT_FORMATS:
+            start_time = time.time()
+            name = get_file_name('config_part_1', output_format)
+            if name in stale_files:
+                # Generate initial config (routing type, appliance, all VNETs, all ENIs, all route groups)
+                tmp_path = os.path.join(INITIAL_OUTPUT_DIR, name + '.tmp')
+                write_json_array(tmp_path, iter_initial_configs(args.num_enis), output_format)
+                files[name] = publish_hashed_file(tmp_path, name)
+
+            # Generate per-ENI combined configs (routes + mappings) from templates rendered once per format
+            eni_file_names = {
+                eni_id: [get_file_name(stem, output_format) for stem in get_eni_stems(eni_id, eni_id in mapping_enis)]
+                for eni_id in range(1, args.num_enis + 1)
+            }
+            stale_eni_ids = [eni_id for eni_id, names in eni_file_names.items() if stale_files.intersection(names)]
+            for name, entry in write_eni_configs(stale_eni_ids, mapping_enis, output_format, publish_hashed_file):
+                files[name] = entry
+            format_files = [get_file_name('config_part_1', output_format)]
+            format_files += [name for names in eni_file_names.values() for name in names]
+            size = sum(files[name]["size"] for name in format_files)
+            format_stats.append((output_format, size, time.time() - start_time))
+        for name in files:
+            files[name]["inputs"] = expected_files[name]
+        save_manifest(files)
+        print(f"Wrote {len(stale_files)} of {len(expected_files)} config files, reused {len(expected_files) - len(stale_files)} from the last run.")
+        print_format_stats(format_stats)
+    elif stale_files:
+        print(f"[WARN] {len(stale_files)} of {len(expected_files)} files in '{INITIAL_OUTPUT_DIR}' are missing or do not match "
+              f"these parameters; rerun with --generate-configs.")
+
+    write_apply_script('summary')
+    write_apply_plan('summary')
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,463 @@
+import argparse
+import gzip
+import json
+import os
+import re
+import select
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import renderIR
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+APPLY_PLAN_FILE = "apply_plan.json"
+CRM_LOG = "crm_apply_timings.csv"
+APPLY_SCRIPT_FILE = "apply_configs.sh"
+TUNING_RESULTS_FILE = "chunk_size_tuning.csv"
+COMMAND_TIMEOUT = 60.0
+CHANNEL_END = "__END__"
+# monitorBulker's summary lines: ENI <n> COMPLETED <seconds> <bulk "took" sum>
+COMPLETED_RE = re.compile(r"^ENI (\d+) COMPLETED\b(?: +\S+ +([0-9.]+))?", re.MULTILINE)
+PUSH_CHUNKSIZE_RE = re.compile(r'^PUSH_CHUNKSIZE="[^"]*"$', re.MULTILINE)
+
+class EniRun:
+    """One ENI on its way through the pipeline: its files, cumulative CRM targets and timestamps."""
+
+    def __init__(self, eni, files, routes, mappings, entries):
+        self.eni = eni
+        self.files = files
+        self.routes = routes # Cumulative routes used once this ENI and all before it are installed
+        self.mappings = mappings
+        self.entries = entries # Routes and mappings of this ENI alone
+        self.chunk_size = None # gnmi-configurator --chunksize, if not the plan's
+        self.took = None # Bulk "took" sum from the ENI's summary line, where it was confirmed from one
+        self.push_started = None
+        self.push_finished = None
+        self.routes_at = None
+        self.mappings_at = None
+        self.confirmed_at = None
+
+class CommandReader:
+    """Runs a shell command per read; its output is the reply."""
+
+    def __init__(self, command):
+        self.command = command
+
+    def read(self):
+        """Returns the command's output, or None if it failed or timed out."""
+        try:
+            result = subprocess.run(self.command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                    timeout=COMMAND_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            return None
+        if result.returncode != 0:
+            return None
+        return result.stdout.decode(errors="replace").replace("\r", "")
+
+    def close(self):
+        pass
+
+class ChannelReader:
+    """
+    Keeps one long-lived command (an ssh session running a read loop on the DPU) for all reads: each read
+    sends a line and collects the reply up to a CHANNEL_END line, so a poll costs a round trip instead of
+    a full ssh handshake. The command is restarted on the next read after it dies or stops answering.
+    """
+
+    def __init__(self, command):
+        self.command = command
+        self.process = None
+        self.buffer = bytearray()
+
+    def read(self):
+        """Returns the reply to one request, or None if the channel failed."""
+        try:
+            if self.process is None:
+                self.process = subprocess.Popen(self.command, shell=True, stdin=subprocess.PIPE,
+                                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            self.process.stdin.write(b"\n")
+            self.process.stdin.flush()
+            reply = []
+            deadline = time.time() + COMMAND_TIMEOUT
+            while True:
+                end = self.buffer.find(b"\n")
+                if end < 0:
+                    if not select.select([self.process.stdout], [], [], max(0.0, deadline - time.time()))[0]:
+                        raise TimeoutError("DPU channel did not answer")
+                    data = os.read(self.process.stdout.fileno(), 65536)
+                    if not data:
+                        raise ConnectionError("DPU channel closed")
+                    self.buffer += data
+                    continue
+                line = self.buffer[:end].decode(errors="replace").rstrip("\r")
+                del self.buffer[:end + 1]
+                if line == CHANNEL_END:
+                    return "".join(f"{reply_line}\n" for reply_line in reply)
+                reply.append(line)
+        except OSError:
+            self.close()
+            return None
+
+    def close(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+            self.buffer = bytearray()
+
+class CounterVerifier:
+    """Confirms ENIs from the cumulative CRM route and mapping counters, both read in one request per poll."""
+
+    def __init__(self, reader):
+        self.reader = reader
+
+    def update(self, runs, now):
+        output = self.reader.read()
+        counts = re.findall(r"-?\d+", output) if output is not None else []
+        if len(counts) != 2:
+            print(f"[CRM] Could not read counters (got {output!r}).")
+            return
+        routes, mappings = int(counts[0]), int(counts[1])
+        print(f"[CRM] Routes {routes}, mappings {mappings}.")
+        for run in runs:
+            if run.routes_at is None and routes >= run.routes:
+                run.routes_at = now
+            if run.mappings_at is None and mappings >= run.mappings:
+                run.mappings_at = now
+            if run.routes_at is not None and run.mappings_at is not None:
+                run.confirmed_at = now
+
+class SummaryVerifier:
+    """Confirms ENIs from the "ENI <n> COMPLETED" lines monitorBulker writes to eni_summary.log on the DPU."""
+
+    def __init__(self, reader):
+        self.reader = reader
+
+    def update(self, runs, now):
+        output = self.reader.read()
+        if output is None:
+            print("[SUMMARY] Could not read the ENI summary log.")
+            return
+        completed = {int(eni): took for eni, took in COMPLETED_RE.findall(output)}
+        for run in runs:
+            if run.eni in completed:
+                run.routes_at = run.mappings_at = run.confirmed_at = now
+                run.took = float(completed[run.eni]) if completed[run.eni] else None
+
+VERIFIERS = {"counters": CounterVerifier, "summary": SummaryVerifier}
+
+def prepare_config(path, work_dir):
+    """Returns a plain JSON array file for path, unpacking compressed, NDJSON and IR configs into work_dir first."""
+    name = os.path.basename(path)
+    if name.endswith(".ir"):
+        return renderIR.render_file(path, os.path.join(work_dir, name[:-len(".ir")] + ".json"))
+    opener = open
+    if name.endswith(".gz"):
+        opener, name = gzip.open, name[:-3]
+    elif name.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"{path} is zstd compressed; install the zstandard module to read it")
+        opener, name = zstandard.open, name[:-4]
+    if opener is open and not name.endswith(".ndjson"):
+        return path
+    out_path = os.path.join(work_dir, name[:-len(".ndjson")] + ".json" if name.endswith(".ndjson") else name)
+    with opener(path, "rb") as src, open(out_path, "wb") as dst:
+        if name.endswith(".ndjson"):
+            # gnmi-configurator reads plain JSON arrays
+            dst.write(b"[")
+            first = True
+            for line in src:
+                line = line.rstrip(b"\n")
+                if line:
+                    dst.write(line if first else b"," + line)
+                    first = False
+            dst.write(b"]")
+        else:
+            shutil.copyfileobj(src, dst, 1 << 20)
+    return out_path
+
+class Orchestrator:
+    """Pushes ENIs in a background thread while the main thread verifies the ones already pushed."""
+
+    def __init__(self, plan, verifier, args):
+        self.plan = plan
+        self.verifier = verifier
+        self.args = args
+        self.runs = []
+        routes = mappings = 0
+        for eni in plan["enis"]:
+            entries = eni["routes"] - routes + eni["mappings"] - mappings
+            routes, mappings = eni["routes"], eni["mappings"]
+            self.runs.append(EniRun(eni["eni"], eni["files"], routes, mappings, entries))
+        self.lock = threading.Lock()
+        self.window = None
+        self.in_flight = []
+        self.failed_eni = None
+        self.work_dir = tempfile.mkdtemp()
+
+    def push_config(self, config_file, name, chunk_size=None):
+        command = [self.args.configurator, "--host", self.plan["host"], "--dpu", str(self.plan["dpu"]),
+                   "--port", str(self.plan["port"]), "--json", config_file,
+                   "--chunksize", str(chunk_size or self.plan["chunk_size"])]
+        for attempt in range(1, self.args.max_push_attempts + 1):
+            if subprocess.call(command) == 0:
+                return True
+            print(f"Pushing {name} failed (attempt {attempt} of {self.args.max_push_attempts}).")
+            time.sleep(self.args.retry_delay)
+        return False
+
+    def push_file(self, path, chunk_size=None):
+        config_file = prepare_config(path, self.work_dir)
+        try:
+            return self.push_config(config_file, path, chunk_size)
+        finally:
+            if config_file != path:
+                os.remove(config_file)
+
+    def push_worker(self, runs):
+        for run in runs:
+            self.window.acquire()
+            run.push_started = time.time()
+            with self.lock:
+                self.in_flight.append(run)
+            for index, path in enumerate(run.files, 1):
+                print(f"Applying {path} (chunk {index} of {len(run.files)})...")
+                try:
+                    pushed = self.push_file(path, run.chunk_size)
+                except Exception as e:  # e.g. a missing chunk, no zstandard module or a corrupt IR file
+                    print(f"Could not push {path}: {e}")
+                    pushed = False
+                if not pushed:
+                    with self.lock:
+                        self.failed_eni = run.eni
+                    return
+            run.push_finished = time.time()
+
+    def run(self, tuner=None):
+        """Applies the initial config, then every ENI (the first ones as a chunk size sweep with a tuner); returns False if a push gave up."""
+        print("Applying initial configuration...")
+        if not self.push_file(self.plan["initial_config"]):
+            return False
+
+        runs = self.runs
+        if tuner is not None:
+            trials = tuner.assign(runs)
+            print(f"Tuning the push chunk size on ENIs {trials[0].eni}-{trials[-1].eni}, one ENI at a time...")
+            if not self.apply_enis(trials, tuner.verifier, 1):
+                return False
+            self.plan["chunk_size"] = tuner.report(trials)
+            runs = runs[len(trials):]
+        if not runs:
+            return True
+        print(f"Applying per-ENI configs with up to {self.args.window} ENI(s) in flight...")
+        return self.apply_enis(runs, self.verifier, self.args.window)
+
+    def apply_enis(self, runs, verifier, window):
+        """Pushes runs with at most window of them unconfirmed at a time; returns False if a push gave up."""
+        self.window = threading.Semaphore(window) # ENIs pushed (or being pushed) but not yet confirmed
+        pusher = threading.Thread(target=self.push_worker, args=(runs,), daemon=True)
+        pusher.start()
+        confirmed = 0
+        while confirmed < len(runs):
+            with self.lock:
+                in_flight = list(self.in_flight)
+                failed_eni = self.failed_eni
+            if failed_eni is None and not pusher.is_alive():
+                # The pusher should only ever stop early through failed_eni; never wait on ENIs nobody pushes
+                failed_eni = next((run.eni for run in runs if run.push_finished is None), None)
+            if failed_eni is not None:
+                print(f"Giving up on ENI {failed_eni}.")
+                return False
+            if not in_flight:
+                time.sleep(0.05)
+                continue
+            verifier.update(in_flight, time.time())
+            done = [run for run in in_flight if run.confirmed_at is not None]
+            with self.lock:
+                self.in_flight = [run for run in self.in_flight if run.confirmed_at is None]
+            for run in done:
+                confirmed += 1
+                self.window.release()
+                self.log_timing(run)
+            if not done:
+                time.sleep(self.args.poll_interval)
+        return True
+
+    def log_timing(self, run):
+        total = run.confirmed_at - run.push_started
+        print(f"ENI {run.eni}: confirmed {total:.2f} seconds after its push started "
+              f"(push took {(run.push_finished or run.confirmed_at) - run.push_started:.2f}s).")
+        with open(self.args.timings_file, "a") as f:
+            f.write(f"{run.eni},{run.routes},{run.routes_at - run.push_started:.3f},"
+                    f"{run.mappings},{run.mappings_at - run.push_started:.3f},{total:.3f}\n")
+
+    def close(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+class ChunkSizeTuner:
+    """
+    Sweeps gnmi-configurator's --chunksize over the first ENIs of a plan, which carry the same entry mix:
+    each trial ENI is pushed at one size and confirmed from its summary line before the next one starts,
+    so the apply-side wall time and the bulker "took" sum of the line both belong to that size alone.
+    """
+
+    def __init__(self, chunk_sizes, repeat, verifier, results_file, script_file, plan_file):
+        self.chunk_sizes = chunk_sizes
+        self.repeat = repeat
+        self.verifier = verifier
+        self.results_file = results_file
+        self.script_file = script_file
+        self.plan_file = plan_file
+
+    def assign(self, runs):
+        """Gives the trial ENIs their chunk sizes (interleaved, so drift over the sweep hits every size) and returns them."""
+        trials = runs[:len(self.chunk_sizes) * self.repeat]
+        entries = {run.entries for run in trials}
+        if len(entries) > 1:
+            print(f"[WARN] Trial ENIs differ in size ({sorted(entries)} entries); comparing entries per second.")
+        for index, run in enumerate(trials):
+            run.chunk_size = self.chunk_sizes[index % len(self.chunk_sizes)]
+        return trials
+
+    def report(self, trials):
+        """Prints and saves the sweep, writes the best chunk size into the apply script and plan, and returns it."""
+        results = []
+        for chunk_size in self.chunk_sizes:
+            runs = [run for run in trials if run.chunk_size == chunk_size]
+            wall = sum(run.confirmed_at - run.push_started for run in runs)
+            entries = sum(run.entries for run in runs)
+            tooks = [run.took for run in runs if run.took is not None]
+            results.append({
+                "chunk_size": chunk_size,
+                "trials": len(runs),
+                "wall_sec": wall / len(runs),
+                "took_sec": sum(tooks) / len(tooks) if tooks else None,
+                "entries_per_sec": entries / wall if wall > 0 else 0.0
+            })
+        best = max(results, key=lambda result: result["entries_per_sec"])
+
+        print("Chunk size sweep (mean per trial ENI):")
+        print(f"{'CHUNKSIZE':>10} {'TRIALS':>6} {'WALL_SEC':>9} {'TOOK_SEC':>9} {'ENTRIES/S':>10}")
+        with open(self.results_file, "w") as f:
+            f.write("CHUNK_SIZE,TRIALS,WALL_TIME_SEC,BULK_TOOK_SEC,ENTRIES_PER_SEC\n")
+            for result in results:
+                took = "" if result["took_sec"] is None else f"{result['took_sec']:.3f}"
+                print(f"{result['chunk_size']:>10} {result['trials']:>6} {result['wall_sec']:>9.2f} "
+                      f"{took or '-':>9} {result['entries_per_sec']:>10.0f}" + ("  <- best" if result is best else ""))
+                f.write(f"{result['chunk_size']},{result['trials']},{result['wall_sec']:.3f},{took},"
+                        f"{result['entries_per_sec']:.1f}\n")
+        self.save(best["chunk_size"])
+        return best["chunk_size"]
+
+    def save(self, chunk_size):
+        try:
+            with open(self.script_file) as f:
+                script = f.read()
+        except FileNotFoundError:
+            script = None
+        if script is not None and PUSH_CHUNKSIZE_RE.search(script):
+            with open(self.script_file, "w") as f:
+                f.write(PUSH_CHUNKSIZE_RE.sub(f'PUSH_CHUNKSIZE="{chunk_size}"', script))
+            print(f"Set PUSH_CHUNKSIZE={chunk_size} in {self.script_file}.")
+        else:
+            print(f"[WARN] No PUSH_CHUNKSIZE line in {self.script_file}; regenerate it to take the tuned chunk size.")
+        with open(self.plan_file) as f:
+            plan = json.load(f)
+        plan["chunk_size"] = chunk_size
+        with open(self.plan_file, "w") as f:
+            json.dump(plan, f, indent=4)
+
+def main(argv=None):
+    """Applies the generated configs, overlapping the push of the next ENIs with the verification of the current one."""
+    parser = argparse.ArgumentParser(
+        description="Applies the configs described by a generator's apply plan, pipelining ENI pushes.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument('--plan', default=APPLY_PLAN_FILE, help="Apply plan written by GenerateConfig.py/GenerateConfig7.py.")
+    parser.add_argument('--window', type=int, default=2,
+                        help="ENIs that may be pushed but not yet confirmed at once (1 = one ENI at a time, like apply_configs.sh).")
+    parser.add_argument('--configurator', default="./gnmi-configurator", help="Program that pushes one JSON config file.")
+    parser.add_argument('--verify', choices=sorted(VERIFIERS), help="How ENIs are confirmed (default: from the plan).")
+    parser.add_argument('--verify-command',
+                        help="Shell command run per check, printing the route and mapping counters (--verify counters) "
+                             "or the ENI summary log (--verify summary).")
+    parser.add_argument('--channel-command',
+                        help="Long-lived shell command answering each line on its stdin with what --verify-command "
+                             "would print, followed by a __END__ line (default: the plan's persistent ssh session, "
+                             "unless --verify-command is given).")
+    parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds between verification checks.")
+    parser.add_argument('--max-push-attempts', type=int, default=3, help="Attempts per config file before giving up.")
+    parser.add_argument('--retry-delay', type=float, default=2.0, help="Seconds between push attempts.")
+    parser.add_argument('--timings-file', default=CRM_LOG, help="CSV file getting each ENI's timings.")
+    parser.add_argument('--tune-chunk-sizes',
+                        help="Comma-separated --chunksize values to sweep on the first ENIs before applying the rest "
+                             "with the fastest one, which is also written into --script and --plan.")
+    parser.add_argument('--tune-repeat', type=int, default=1, help="Trial ENIs per swept chunk size.")
+    parser.add_argument('--summary-command',
+                        help="Shell command printing the DPU's eni_summary.log for the sweep (default: the plan's "
+                             "persistent session, or the verification reads with --verify summary).")
+    parser.add_argument('--tune-results-file', default=TUNING_RESULTS_FILE, help="CSV file getting the sweep results.")
+    parser.add_argument('--script', default=APPLY_SCRIPT_FILE, help="Apply script whose PUSH_CHUNKSIZE gets the tuned value.")
+    args = parser.parse_args(argv)
+    if args.window < 1:
+        parser.error("--window must be at least 1")
+    try:
+        chunk_sizes = [int(size) for size in args.tune_chunk_sizes.split(",")] if args.tune_chunk_sizes else []
+    except ValueError:
+        parser.error("--tune-chunk-sizes takes comma-separated integers")
+    if any(size < 1 for size in chunk_sizes) or args.tune_repeat < 1:
+        parser.error("chunk sizes and --tune-repeat must be at least 1")
+
+    with open(args.plan) as f:
+        plan = json.load(f)
+    if args.channel_command or (not args.verify_command and plan.get("channel_command")):
+        reader = ChannelReader(args.channel_command or plan["channel_command"])
+    else:
+        reader = CommandReader(args.verify_command or plan["verify_command"])
+    verify = args.verify or plan["verify"]
+    verifier = VERIFIERS[verify](reader)
+    orchestrator = Orchestrator(plan, verifier, args)
+    tuner = None
+    if chunk_sizes:
+        # The sweep needs monitorBulker's summary lines for the "took" sums, whatever confirms the other ENIs
+        if args.summary_command:
+            summary_reader = CommandReader(args.summary_command)
+        elif verify == "summary":
+            summary_reader = reader
+        else:
+            summary_reader = ChannelReader(plan["summary_channel_command"])
+        tuner = ChunkSizeTuner(chunk_sizes, args.tune_repeat, SummaryVerifier(summary_reader),
+                               args.tune_results_file, args.script, args.plan)
+        if len(chunk_sizes) * args.tune_repeat > len(orchestrator.runs):
+            parser.error(f"the sweep needs {len(chunk_sizes) * args.tune_repeat} ENIs, the plan has {len(orchestrator.runs)}")
+
+    with open(args.timings_file, "w") as f:
+        f.write("CRM Apply Timings\n")
+        f.write("ENI_ID,ROUTES_EXPECTED,ROUTES_APPLIED_TIME_SEC,MAPPINGS_EXPECTED,MAPPINGS_APPLIED_TIME_SEC,TOTAL_TIME_SEC\n")
+
+    start_time = time.time()
+    try:
+        ok = orchestrator.run(tuner)
+    except KeyboardInterrupt:
+        print("Interrupt received, stopping...")
+        ok = False
+    finally:
+        orchestrator.close()
+        reader.close()
+        if tuner is not None:
+            tuner.verifier.reader.close()
+    if not ok:
+        sys.exit(1)
+    print(f"Total time for all ENIs: {time.time() - start_time:.2f} seconds.")
+    print(f"All configurations applied successfully. Timing results in {args.timings_file}.")
+
+if __name__ == "__main__":
+    main()
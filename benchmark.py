@@ -0,0 +1,472 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = "benchmark_results.jsonl"
+COUNTERS_DB = 2
+CRM_STATS_KEY = b"CRM:STATS"
+CRM_ROUTES_FIELD = b"crm_stats_dash_ipv4_outbound_routing_used"
+CRM_MAPPINGS_FIELD = b"crm_stats_dash_ipv4_outbound_ca_to_pa_used"
+NOTIFY_INTERVAL = 0.02 # Seconds between keyspace notification checks of the fake COUNTERS_DB
+
+# --- Synthetic syslog ---
+
+def format_ram_test_line(eni, took, index):
+    return (f"{datetime.datetime.now():%b %d %H:%M:%S} sonic-dpu orchagent#orchagent: :- bulkCreate: "
+            f"Ram Test eni{eni} batch {index} took {took:.6f} seconds\n")
+
+def format_noise_line(index):
+    return f"{datetime.datetime.now():%b %d %H:%M:%S} sonic-dpu syncd#syncd: :- processEvent: event {index} handled\n"
+
+class SyslogWriter:
+    """Appends "Ram Test ... took X seconds" lines (and unrelated noise lines) to a file at a given rate."""
+
+    def __init__(self, path, noise_ratio=0):
+        self.path = path
+        self.noise_ratio = noise_ratio # Unrelated lines written per "Ram Test" line
+        self.lines = 0 # "Ram Test" lines written so far
+        self.took_sum = 0.0
+
+    def write_burst(self, count, eni=1, took=0.001):
+        """Writes count "Ram Test" lines at once, as fast as the file takes them."""
+        lines = []
+        for _ in range(count):
+            lines.extend(format_noise_line(self.lines) for _ in range(self.noise_ratio))
+            lines.append(format_ram_test_line(eni, took, self.lines))
+            self.lines += 1
+            self.took_sum += took
+        with open(self.path, "a") as f:
+            f.writelines(lines)
+
+    def write_paced(self, rate, duration, eni_of=lambda: 1, took=0.001, stop=None):
+        """Writes rate "Ram Test" lines per second for duration seconds, each tagged with eni_of() at that moment."""
+        start = time.time()
+        written = 0
+        with open(self.path, "a") as f:
+            while time.time() - start < duration and not (stop and stop.is_set()):
+                due = int((time.time() - start) * rate)
+                lines = []
+                for _ in range(due - written):
+                    lines.extend(format_noise_line(self.lines) for _ in range(self.noise_ratio))
+                    lines.append(format_ram_test_line(eni_of(), took, self.lines))
+                    self.lines += 1
+                    self.took_sum += took
+                written = due
+                f.writelines(lines)
+                f.flush()
+                time.sleep(0.01)
+
+# --- Fake COUNTERS_DB ---
+
+def bulk(value):
+    return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+class FakeCountersDb:
+    """
+    A unix socket Redis stand-in for COUNTERS_DB whose CRM:STATS route and mapping counters ramp on a
+    schedule: after start_ramp(), each ENI's entries are installed linearly over eni_interval seconds.
+    Speaks enough RESP for monitorBulker: SELECT, HGET/HMGET/HSET, CONFIG GET/SET and keyspace SUBSCRIBE.
+    """
+
+    def __init__(self, socket_path, routes, mappings, num_enis, num_vnets, eni_interval):
+        self.socket_path = socket_path
+        self.routes = routes
+        self.mappings = mappings
+        self.num_enis = num_enis
+        self.num_vnets = num_vnets
+        self.eni_interval = eni_interval
+        self.ramp_start = None
+        self.config = {b"notify-keyspace-events": b""}
+        self.hashes = {}
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.server = None
+        self.stopped = threading.Event()
+
+    def expected_counts(self, enis):
+        return self.routes * enis, self.mappings * min(enis, self.num_vnets)
+
+    def counts(self, now=None):
+        """CRM route and mapping counters at time now."""
+        if self.ramp_start is None:
+            return 0, 0
+        elapsed = max(0.0, (now or time.time()) - self.ramp_start)
+        done = min(int(elapsed // self.eni_interval), self.num_enis)
+        routes, mappings = self.expected_counts(done)
+        if done < self.num_enis:
+            fraction = (elapsed % self.eni_interval) / self.eni_interval
+            routes += int(self.routes * fraction)
+            if done < self.num_vnets:
+                mappings += int(self.mappings * fraction)
+        return routes, mappings
+
+    def completion_times(self):
+        """When each ENI's cumulative counters are reached, per the schedule."""
+        return {eni: self.ramp_start + eni * self.eni_interval for eni in range(1, self.num_enis + 1)}
+
+    def start(self):
+        db = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def send(self, data):
+                with db.lock:
+                    self.wfile.write(data)
+
+            def handle(self):
+                try:
+                    while True:
+                        line = self.rfile.readline()
+                        if not line:
+                            return
+                        args = []
+                        for _ in range(int(line[1:])):
+                            length = int(self.rfile.readline()[1:])
+                            args.append(self.rfile.read(length + 2)[:-2])
+                        self.send(db.execute(self, args))
+                except (OSError, ValueError):
+                    pass
+                finally:
+                    db.subscribers.discard(self)
+
+        self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self.notify_worker, daemon=True).start()
+
+    def start_ramp(self):
+        self.ramp_start = time.time()
+
+    def execute(self, handler, args):
+        command = args[0].upper()
+        if command in (b"SELECT", b"PING"):
+            return b"+OK\r\n" if command == b"SELECT" else b"+PONG\r\n"
+        if command == b"CONFIG" and args[1].upper() == b"GET":
+            return b"*2\r\n" + bulk(args[2]) + bulk(self.config.get(args[2], b""))
+        if command == b"CONFIG":
+            self.config[args[2]] = args[3]
+            return b"+OK\r\n"
+        if command == b"SUBSCRIBE":
+            self.subscribers.add(handler)
+            return b"*3\r\n" + bulk(b"subscribe") + bulk(args[1]) + b":1\r\n"
+        if command in (b"HGET", b"HMGET"):
+            fields = dict(self.hashes.get(args[1], {}))
+            if args[1] == CRM_STATS_KEY:
+                routes, mappings = self.counts()
+                fields[CRM_ROUTES_FIELD] = str(routes).encode()
+                fields[CRM_MAPPINGS_FIELD] = str(mappings).encode()
+            if command == b"HGET":
+                return bulk(fields.get(args[2]))
+            return b"*%d\r\n" % (len(args) - 2) + b"".join(bulk(fields.get(field)) for field in args[2:])
+        if command == b"HSET":
+            self.hashes.setdefault(args[1], {})[args[2]] = args[3]
+            return b":1\r\n"
+        return b"-ERR unknown command\r\n"
+
+    def notify_worker(self):
+        """Publishes a CRM:STATS keyspace notification whenever the ramped counters change, like a real hset would."""
+        channel = b"__keyspace@%d__:%s" % (COUNTERS_DB, CRM_STATS_KEY)
+        message = b"*3\r\n" + bulk(b"message") + bulk(channel) + bulk(b"hset")
+        last = None
+        while not self.stopped.wait(NOTIFY_INTERVAL):
+            counts = self.counts()
+            if counts != last and b"K" in self.config[b"notify-keyspace-events"]:
+                for handler in list(self.subscribers):
+                    try:
+                        handler.send(message)
+                    except OSError:
+                        self.subscribers.discard(handler)
+            last = counts
+
+    def stop(self):
+        self.stopped.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+# --- Measuring child processes ---
+
+def run_measured(command, cwd, stdout=subprocess.DEVNULL, on_start=None):
+    """Runs command to completion; returns (exit status, wall seconds, CPU seconds, peak RSS in MB)."""
+    start = time.time()
+    process = subprocess.Popen(command, cwd=cwd, stdout=stdout, stderr=subprocess.STDOUT)
+    if on_start is not None:
+        on_start(process)
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.time() - start
+    # ru_maxrss is in kilobytes on Linux
+    return process.returncode, wall, usage.ru_utime + usage.ru_stime, usage.ru_maxrss / 1024
+
+def count_lines(path, pattern=b"[ENI "):
+    try:
+        with open(path, "rb") as f:
+            return sum(1 for line in f if line.startswith(pattern))
+    except FileNotFoundError:
+        return 0
+
+def summarize(values):
+    values = sorted(values)
+    if not values:
+        return None
+    return {
+        "mean": round(sum(values) / len(values), 6),
+        "p50": round(values[(len(values) - 1) // 2], 6),
+        "max": round(values[-1], 6)
+    }
+
+# --- Benchmarks ---
+
+def bench_monitor(args):
+    """Runs monitorBulker against the fake COUNTERS_DB and a synthetic syslog; returns its results."""
+    work_dir = tempfile.mkdtemp(prefix="bench_monitor_")
+    syslog_path = os.path.join(work_dir, "syslog")
+    open(syslog_path, "w").close()
+    db = FakeCountersDb(os.path.join(work_dir, "redis.sock"), args.routes, args.mappings, args.enis,
+                        args.num_vnets, args.eni_interval)
+    db.start()
+    writer = SyslogWriter(syslog_path, args.noise_ratio)
+    # Unbuffered, so the "Initial baseline" line drive() waits for reaches the pipe when it is printed
+    command = [sys.executable, "-u", os.path.join(SCRIPT_DIR, "monitorBulker.py"), "--redis-socket", db.socket_path,
+               "--counters-db", str(COUNTERS_DB), "--syslog", syslog_path, "--checkpoint", "checkpoint.json",
+               "-r", str(args.routes), "-m", str(args.mappings), "-t", str(args.enis), "--num-vnets", str(args.num_vnets),
+               "--poll-interval", str(args.poll_interval), "--progress-interval", "0"] + args.monitor_args
+    burst = {}
+    stop = threading.Event()
+    watchdog = []
+
+    def arm_watchdog(process, seconds):
+        # Kills monitorBulker if the current phase overruns; replaces the previous phase's timer
+        for timer in watchdog:
+            timer.cancel()
+        watchdog[:] = [threading.Timer(seconds, process.kill)]
+        watchdog[0].daemon = True
+        watchdog[0].start()
+
+    def drive(process):
+        # Wait for the baseline read, by which time the syslog follower is running; the watchdog covers
+        # a monitor that never gets there, as well as the burst phase after it
+        arm_watchdog(process, 2 * args.timeout)
+        for line in process.stdout:
+            if b"Initial baseline" in line:
+                break
+        threading.Thread(target=lambda: process.stdout.read(), daemon=True).start()
+
+        # Burst phase: how fast a backlog of lines is handled
+        ram_log = os.path.join(work_dir, "ram_test.log")
+        start = time.time()
+        writer.write_burst(args.burst_lines)
+        while count_lines(ram_log) < args.burst_lines and time.time() - start < args.timeout:
+            time.sleep(0.01)
+        burst["seconds"] = time.time() - start
+        burst["handled"] = count_lines(ram_log)
+
+        # Ramp phase: counters climb on schedule while lines arrive at the paced rate
+        db.start_ramp()
+        duration = args.enis * args.eni_interval
+        eni_of = lambda: min(int((time.time() - db.ramp_start) // args.eni_interval) + 1, args.enis)
+        threading.Thread(target=writer.write_paced, args=(args.line_rate, duration, eni_of, 0.001, stop),
+                         daemon=True).start()
+        arm_watchdog(process, duration + args.timeout)
+
+    try:
+        status, wall, cpu, rss = run_measured(command, work_dir, subprocess.PIPE, drive)
+    finally:
+        for timer in watchdog:
+            timer.cancel()
+        stop.set()
+        db.stop()
+
+    completion_times = db.completion_times() if db.ramp_start is not None else {}
+    latencies = []
+    try:
+        with open(os.path.join(work_dir, "eni_metrics.jsonl")) as f:
+            for line in f:
+                metrics = json.loads(line)
+                latencies.append(metrics["completed_at"] - completion_times[metrics["eni"]])
+    except FileNotFoundError:
+        pass
+    handled = count_lines(os.path.join(work_dir, "ram_test.log"))
+    results = {
+        "exit_status": status,
+        "enis": args.enis,
+        "enis_detected": len(latencies),
+        "wall_sec": round(wall, 3),
+        "cpu_sec": round(cpu, 3),
+        "cpu_percent": round(100 * cpu / wall, 1) if wall > 0 else None,
+        "peak_rss_mb": round(rss, 1),
+        "burst_lines": args.burst_lines,
+        "burst_lines_per_sec": round(burst["handled"] / burst["seconds"], 1) if burst.get("seconds") else None,
+        "paced_line_rate": args.line_rate,
+        "lines_written": writer.lines,
+        "lines_handled": handled,
+        "detection_latency_sec": summarize(latencies)
+    }
+    if args.keep:
+        results["work_dir"] = work_dir
+    else:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def parse_scales(text):
+    """Parses ROUTES:MAPPINGS[,ROUTES:MAPPINGS...]."""
+    scales = []
+    for item in text.split(","):
+        routes, _, mappings = item.partition(":")
+        scales.append((int(routes), int(mappings or routes)))
+    return scales
+
+def bench_generators(args):
+    """Runs each generator at each scale in a scratch directory; returns time and peak memory per run and per ENI."""
+    results = []
+    for script in args.generators:
+        for routes, mappings in parse_scales(args.scales):
+            work_dir = tempfile.mkdtemp(prefix="bench_generator_")
+            command = [sys.executable, os.path.join(SCRIPT_DIR, script), str(routes), str(mappings), str(args.enis),
+                       "0", "localhost", "--jobs", str(args.jobs)] + args.generator_args
+            if script == "GenerateConfig7.py":
+                command.append("--generate-configs")
+            status, wall, cpu, rss = run_measured(command, work_dir)
+            size = sum(os.path.getsize(os.path.join(root, name))
+                       for root, _, names in os.walk(os.path.join(work_dir, "split_configs")) for name in names)
+            shutil.rmtree(work_dir, ignore_errors=True)
+            results.append({
+                "generator": script,
+                "routes": routes,
+                "mappings": mappings,
+                "enis": args.enis,
+                "jobs": args.jobs,
+                "exit_status": status,
+                "wall_sec": round(wall, 3),
+                "wall_sec_per_eni": round(wall / args.enis, 4),
+                "cpu_sec": round(cpu, 3),
+                "peak_rss_mb": round(rss, 1),
+                "output_mb": round(size / (1 << 20), 2)
+            })
+            print(f"[INFO] {script} {routes}:{mappings} x {args.enis}: {wall:.2f}s ({wall / args.enis:.3f}s/ENI), "
+                  f"peak RSS {rss:.1f} MB")
+    return results
+
+def get_version():
+    """The git commit being measured, so results of different versions can be told apart."""
+    try:
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"], cwd=SCRIPT_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def save_results(path, suite, results):
+    record = {
+        "suite": suite,
+        "version": get_version(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "results": results
+    }
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"[INFO] Results appended to {path}.")
+
+def main(argv=None):
+    """Offline benchmarks of monitorBulker and the generators, plus the stand-ins they run against."""
+    parser = argparse.ArgumentParser(
+        description="Benchmarks monitorBulker and the config generators without a DPU.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument('--results-file', default=RESULTS_FILE, help="JSON lines file each benchmark run is appended to.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    monitor = subparsers.add_parser('monitor', help="Benchmark monitorBulker.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    monitor.add_argument('-r', '--routes', type=int, default=100000, help="Routes per ENI.")
+    monitor.add_argument('-m', '--mappings', type=int, default=125000, help="Mappings per ENI.")
+    monitor.add_argument('-t', '--enis', type=int, default=8, help="ENIs in the simulated run.")
+    monitor.add_argument('--num-vnets', type=int, default=1024, help="VNETs shared by the ENIs.")
+    monitor.add_argument('--eni-interval', type=float, default=2.0, help="Seconds the fake counters take per ENI.")
+    monitor.add_argument('--line-rate', type=float, default=2000.0, help="'Ram Test' lines per second during the ramp.")
+    monitor.add_argument('--burst-lines', type=int, default=200000, help="'Ram Test' lines written at once before the ramp.")
+    monitor.add_argument('--noise-ratio', type=int, default=4, help="Unrelated syslog lines per 'Ram Test' line.")
+    monitor.add_argument('--poll-interval', type=float, default=1.0, help="monitorBulker --poll-interval.")
+    monitor.add_argument('--timeout', type=float, default=60.0, help="Seconds allowed past the schedule before giving up.")
+    monitor.add_argument('--keep', action='store_true', help="Keep the scratch directory with the monitor's logs.")
+    monitor.add_argument('monitor_args', nargs=argparse.REMAINDER,
+                         help="Extra monitorBulker arguments (after --), e.g. -- --events or -- --adaptive.")
+
+    generators = subparsers.add_parser('generators', help="Benchmark the config generators.",
+                                       formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    generators.add_argument('--generators', nargs='+', default=["GenerateConfig.py", "GenerateConfig7.py"],
+                            choices=["GenerateConfig.py", "GenerateConfig7.py"], help="Generators to run.")
+    generators.add_argument('--scales', default="1000:1000,10000:12500,100000:125000",
+                            help="Comma-separated ROUTES:MAPPINGS per ENI to run each generator at.")
+    generators.add_argument('--enis', type=int, default=4, help="ENIs per run.")
+    generators.add_argument('--jobs', type=int, default=1, help="Generator --jobs.")
+    generators.add_argument('generator_args', nargs=argparse.REMAINDER,
+                            help="Extra generator arguments (after --), e.g. -- --format compact.gz.")
+
+    syslog = subparsers.add_parser('syslog', help="Append synthetic 'Ram Test' lines to a file (for manual runs).",
+                                   formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    syslog.add_argument('path', help="File to append to.")
+    syslog.add_argument('--rate', type=float, default=1000.0, help="'Ram Test' lines per second.")
+    syslog.add_argument('--duration', type=float, default=60.0, help="Seconds to keep writing.")
+    syslog.add_argument('--eni', type=int, default=1, help="ENI named in the lines.")
+    syslog.add_argument('--took', type=float, default=0.001, help="'took' seconds in each line.")
+    syslog.add_argument('--noise-ratio', type=int, default=0, help="Unrelated lines per 'Ram Test' line.")
+
+    counters = subparsers.add_parser('counters-db', help="Serve a fake COUNTERS_DB with ramping CRM counters (for manual runs).",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    counters.add_argument('socket', help="Unix socket path to listen on.")
+    counters.add_argument('-r', '--routes', type=int, default=100000, help="Routes per ENI.")
+    counters.add_argument('-m', '--mappings', type=int, default=125000, help="Mappings per ENI.")
+    counters.add_argument('-t', '--enis', type=int, default=64, help="ENIs to ramp through.")
+    counters.add_argument('--num-vnets', type=int, default=1024, help="VNETs shared by the ENIs.")
+    counters.add_argument('--eni-interval', type=float, default=5.0, help="Seconds per ENI.")
+    counters.add_argument('--delay', type=float, default=5.0, help="Seconds at zero before the ramp starts.")
+    args = parser.parse_args(argv)
+    for name in ("monitor_args", "generator_args"):
+        extra = getattr(args, name, None)
+        if extra and extra[0] == "--":
+            setattr(args, name, extra[1:])
+
+    if args.command == "monitor":
+        results = bench_monitor(args)
+        print(json.dumps(results, indent=4))
+        save_results(args.results_file, "monitor", results)
+        if results["exit_status"] != 0:
+            sys.exit(1)
+    elif args.command == "generators":
+        results = bench_generators(args)
+        save_results(args.results_file, "generators", results)
+        if any(result["exit_status"] != 0 for result in results):
+            sys.exit(1)
+    elif args.command == "syslog":
+        writer = SyslogWriter(args.path, args.noise_ratio)
+        writer.write_paced(args.rate, args.duration, lambda: args.eni, args.took)
+        print(f"[INFO] Wrote {writer.lines} 'Ram Test' lines.")
+    elif args.command == "counters-db":
+        db = FakeCountersDb(args.socket, args.routes, args.mappings, args.enis, args.num_vnets, args.eni_interval)
+        db.start()
+        print(f"[INFO] Serving COUNTERS_DB (db {COUNTERS_DB}) on {args.socket}; ramp starts in {args.delay}s.")
+        try:
+            time.sleep(args.delay)
+            db.start_ramp()
+            while True:
+                time.sleep(args.eni_interval)
+                routes, mappings = db.counts()
+                print(f"[INFO] Routes {routes}, mappings {mappings}")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            db.stop()
+            os.remove(args.socket)
+
+if __name__ == "__main__":
+    main()
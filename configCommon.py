@@ -0,0 +1,978 @@
+import argparse
+import array
+import collections
+import functools
+import gzip
+import itertools
+import json
+import multiprocessing
+import os
+import struct
+import sys
+import shutil
+import tempfile
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the batch engine falls back to plain Python
+    np = None
+
+try:
+    import zstandard
+except ImportError:  # Only needed for the .zst output formats
+    zstandard = None
+
+# Constants
+NUM_VNETS = 1024
+MAX_UNDERLAY_IP_COMBINATIONS = 1048575
+INITIAL_OUTPUT_DIR = 'split_configs'
+VNET_OUTPUT_DIR = 'vnet_mappings'
+DELTA_OUTPUT_DIR = 'delta_configs'
+WRITE_BUFFER_SIZE = 1 << 20
+BATCH_SIZE = 65536
+TEMPLATE_READ_SIZE = 1 << 22
+VALIDATE_BLOCK_SIZE = 1 << 22
+ENI_PLACEHOLDER = b'@ENI@'
+VNET_PLACEHOLDER = b'@VNET@'
+APPLY_PLAN_FILE = 'apply_plan.json'
+IR_MAGIC = b'DASHIR01'
+RENDER_IR_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'renderIR.py')
+
+# Run parameters; a generator's main() sets them with set_run_parameters(), library users may assign them directly
+NUM_OUTBOUND_ROUTES_PER_ENI = 0
+NUM_VNET_MAPPINGS_PER_ENI = 0
+NUM_ENIS = 0
+DPU_NUMBER = 0
+HOSTNAME = 'localhost'
+JOBS = 1
+CHUNK_SIZE = 0
+DELTA_FROM = None
+OUTPUT_FORMATS = ['json']
+
+# Address and GUID policy, which differs between GenerateConfig.py and GenerateConfig7.py; each script's main()
+# installs its own with set_policy(), like the run parameters, so importing a script leaves it alone
+POLICY = None
+
+def set_policy(policy):
+    """Installs the generator whose addresses and GUIDs are written: any object (in practice the generator
+    script's module) with generate_guid(name), overlay_octets(start, stop), underlay_octets(start, stop),
+    MAPPING_FORMAT, mapping_ir_arrays(start, stop) and get_changed_mappings(old_mappings, old_enis)."""
+    global POLICY
+    POLICY = policy
+
+def generate_routing_type_table():
+    return [
+        {
+            "DASH_ROUTING_TYPE_TABLE:privatelink": {
+                "items": [
+                    {"action_name": "action1", "action_type": "4_to_6"},
+                    {"action_name": "action2", "action_type": "staticencap", "encap_type": "nvgre", "vni": 300}
+                ]
+            },
+            "OP": "SET"
+        }
+    ]
+
+def generate_vnet_table(vnet_id, generate_guid):
+    vni = 5000 + vnet_id
+    return {
+        f"DASH_VNET_TABLE:Vnet{vnet_id}": {
+            "vni": str(vni),
+            "guid": generate_guid(f"Vnet{vnet_id}")
+        },
+        "OP": "SET"
+    }
+
+def generate_appliance_table():
+    return [
+        {
+            "DASH_APPLIANCE_TABLE:22": {
+                "sip": "10.201.0.10",
+                "vm_vni": "101"
+            },
+            "OP": "SET"
+        }
+    ]
+
+def generate_eni_table(eni_id, vnet_id):
+    mac_address = f"00:00:00:00:{eni_id:02x}:{eni_id:02x}"
+    return {
+        f"DASH_ENI_TABLE:eni{eni_id}": {
+            "mac_address": mac_address,
+            "underlay_ip": f"13.132.111.{eni_id % 256}",
+            "admin_state": "enabled",
+            "vnet": f"Vnet{vnet_id}",
+            "pl_underlay_sip": "10.201.0.10",
+            "pl_sip_encoding": f"0:0:0:2000:111:{eni_id:02x}::/::ffff:ffff:0:0"
+        },
+        "OP": "SET"
+    }
+
+def generate_route_group_table(eni_id, generate_guid):
+    return {
+        f"DASH_ROUTE_GROUP_TABLE:group_id_eni{eni_id}": {
+            "guid": generate_guid(f"group_id_eni{eni_id}"),
+            "version": "1"
+        },
+        "OP": "SET"
+    }
+
+# Batch engine: computes the address octets of a whole block of entries at once (vectorized
+# with NumPy when available) and only formats strings when the block is serialized.
+ROUTE_FORMAT = {
+    "DASH_ROUTE_TABLE:group_id_eni%s:13.%d.%d.%d/32": {
+        "action_type": "vnet",
+        "vnet": "Vnet%s"
+    },
+    "OP": "SET"
+}
+ROUTE_DEL_FORMAT = {"DASH_ROUTE_TABLE:group_id_eni%s:13.%d.%d.%d/32": {}, "OP": "DEL"}
+MAPPING_DEL_FORMAT = {"DASH_VNET_MAPPING_TABLE:Vnet%s:13.%d.%d.%d": {}, "OP": "DEL"}
+
+def as_lists(columns):
+    """Converts engine columns to plain lists, which format much faster than NumPy scalars."""
+    return [column.tolist() for column in columns] if np is not None else columns
+
+def mapping_octets(start, stop):
+    """Overlay prefix octets followed by underlay IP octets of mapping ids [start, stop)."""
+    return (*POLICY.overlay_octets(start, stop), *POLICY.underlay_octets(start, stop))
+
+def iter_element_blocks(config_format, columns, start, stop, leading=(), trailing=(), output_format='json'):
+    """Yields config_format filled in with each row of columns(start, stop), BATCH_SIZE elements per block of text."""
+    element = render_config(config_format, output_format)
+    separator = get_layout(output_format)['separator']
+    for block_start in range(start, stop, BATCH_SIZE):
+        block_stop = min(block_start + BATCH_SIZE, stop)
+        rows = zip(*as_lists(columns(block_start, block_stop)))
+        yield separator.join([element % (*leading, *row, *trailing) for row in rows])
+
+def iter_route_blocks(eni_id, vnet_id, start, stop, output_format='json'):
+    """Yields the text of routes [start, stop) of an ENI."""
+    return iter_element_blocks(ROUTE_FORMAT, POLICY.overlay_octets, start, stop, (eni_id,), (vnet_id,), output_format)
+
+def iter_mapping_blocks(vnet_id, start, stop, output_format='json'):
+    """Yields the text of VNET mappings [start, stop)."""
+    return iter_element_blocks(POLICY.MAPPING_FORMAT, mapping_octets, start, stop, (vnet_id,), (), output_format)
+
+# Binary IR ('ir' format): per ENI file, a JSON header with the ENI, VNET, entry counts and the
+# element formats, followed by the entries as uint32 IPv4 addresses that renderIR.py turns back
+# into any of the JSON layouts. Placeholders are named so the renderer needs no generator code.
+ROUTE_IR_FORMAT = {
+    "DASH_ROUTE_TABLE:group_id_eni{eni}:{overlay}/32": {
+        "action_type": "vnet",
+        "vnet": "Vnet{vnet}"
+    },
+    "OP": "SET"
+}
+MAPPING_IR_FORMAT = {
+    "DASH_VNET_MAPPING_TABLE:Vnet{vnet}:{overlay}": {
+        "routing_type": "privatelink",
+        "underlay_ip": "{underlay}"
+    },
+    "OP": "SET"
+}
+
+def pack_addresses(first, second, third, last):
+    """Packs octet columns (or constant octets) into little-endian uint32 addresses."""
+    if np is not None:
+        first, second, third, last = (np.asarray(octet, dtype=np.uint32) for octet in (first, second, third, last))
+        return ((first << 24) | (second << 16) | (third << 8) | last).astype('<u4').tobytes()
+    columns = [itertools.repeat(octet) if isinstance(octet, int) else octet for octet in (first, second, third, last)]
+    addresses = array.array('I', [(a << 24) | (b << 16) | (c << 8) | d for a, b, c, d in zip(*columns)])
+    if sys.byteorder == 'big':
+        addresses.byteswap()
+    return addresses.tobytes()
+
+def route_ir_arrays(start, stop):
+    """Overlay addresses of route ids [start, stop)."""
+    return (pack_addresses(13, *POLICY.overlay_octets(start, stop)),)
+
+# Output formats are a layout (how each element is rendered and how elements are framed into
+# a file), optionally followed by a compression suffix, e.g. 'json', 'compact.gz' or 'ndjson.zst'.
+LAYOUTS = {
+    'json': {'indent': 2, 'separators': (',', ': '), 'prefix': '  ',
+             'open': '[\n', 'separator': ',\n', 'close': '\n]', 'empty': '[]', 'extension': '.json'},
+    'compact': {'indent': None, 'separators': (',', ':'), 'prefix': '',
+                'open': '[', 'separator': ',', 'close': ']', 'empty': '[]', 'extension': '.min.json'},
+    'ndjson': {'indent': None, 'separators': (',', ':'), 'prefix': '',
+               'open': '', 'separator': '\n', 'close': '\n', 'empty': '', 'extension': '.ndjson'},
+    # Not text: see write_ir(); renderIR.py renders it to any of the layouts above
+    'ir': {'extension': '.ir'},
+}
+
+def get_layout(output_format):
+    return LAYOUTS[output_format.partition('.')[0]]
+
+def get_file_name(stem, output_format):
+    """File name of a config file in the given format, e.g. eni_1_combined.ndjson.gz."""
+    layout_name, _, compression = output_format.partition('.')
+    return stem + LAYOUTS[layout_name]['extension'] + (f'.{compression}' if compression else '')
+
+def open_output(path, output_format):
+    """Opens path for binary writing, compressed as the format asks."""
+    compression = output_format.partition('.')[2]
+    if compression == 'gz':
+        # mtime=0 keeps the output reproducible across runs and --jobs settings
+        return gzip.GzipFile(path, 'wb', compresslevel=6, mtime=0)
+    if compression == 'zst':
+        return zstandard.ZstdCompressor().stream_writer(open(path, 'wb', buffering=WRITE_BUFFER_SIZE))
+    return open(path, 'wb', buffering=WRITE_BUFFER_SIZE)
+
+def render_config(config, output_format='json'):
+    """Renders one config as an element of a file of the given format."""
+    layout = get_layout(output_format)
+    text = json.dumps(config, indent=layout['indent'], separators=layout['separators'])
+    return layout['prefix'] + text.replace('\n', '\n' + layout['prefix'])
+
+def write_json_blocks(path, blocks, output_format='json'):
+    """Writes pre-rendered blocks of elements as one file; for 'json' identical to json.dump(..., indent=2)."""
+    layout = get_layout(output_format)
+    with open_output(path, output_format) as f:
+        first = True
+        for block in blocks:
+            f.write((layout['open'] if first else layout['separator']).encode())
+            f.write(block.encode())
+            first = False
+        f.write((layout['empty'] if first else layout['close']).encode())
+
+def write_json_array(path, configs, output_format='json'):
+    """Streams configs to path one element at a time."""
+    if output_format == 'ir':
+        write_ir(path, {"configs": list(configs)})
+        return
+    write_json_blocks(path, (render_config(config, output_format) for config in configs), output_format)
+
+def write_ir(path, header, arrays=()):
+    """Writes an IR file: magic, header length, JSON header padded to 4 bytes, then the address arrays."""
+    header = json.dumps(header, separators=(',', ':')).encode()
+    # Keep the arrays 4-byte aligned so the renderer can cast them in place
+    header += b' ' * (-(len(IR_MAGIC) + 4 + len(header)) % 4)
+    with open(path, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+        f.write(IR_MAGIC + struct.pack('<I', len(header)) + header)
+        for data in arrays:
+            f.write(data)
+
+def write_template(path, blocks, output_format):
+    """Renders blocks once into a template file, with elements separated as in the final file."""
+    separator = get_layout(output_format)['separator']
+    with open(path, 'w', buffering=WRITE_BUFFER_SIZE) as f:
+        first = True
+        for block in blocks:
+            if not first:
+                f.write(separator)
+            f.write(block)
+            first = False
+
+def copy_template(f, template_path, eni_id, vnet_id):
+    """Copies a template into f in large blocks, splicing in the ENI and VNET identifiers."""
+    eni = str(eni_id).encode()
+    vnet = str(vnet_id).encode()
+    pending = b''
+    with open(template_path, 'rb') as template:
+        for block in iter(lambda: template.read(TEMPLATE_READ_SIZE), b''):
+            block = pending + block
+            # '@' only occurs around placeholders; an odd count means the block cuts the last one in two
+            cut = block.rfind(b'@') if block.count(b'@') % 2 else len(block)
+            pending = block[cut:]
+            f.write(block[:cut].replace(ENI_PLACEHOLDER, eni).replace(VNET_PLACEHOLDER, vnet))
+    f.write(pending)
+
+def get_eni_chunks(with_mappings):
+    """Splits an ENI's routes, followed by its mappings if it carries them, into lists of (kind, start, stop)
+    segments of at most CHUNK_SIZE entries each; without --chunk-size the whole ENI is a single chunk."""
+    segments = [('routes', 0, NUM_OUTBOUND_ROUTES_PER_ENI)]
+    if with_mappings:
+        segments.append(('mappings', 0, NUM_VNET_MAPPINGS_PER_ENI))
+    segments = [segment for segment in segments if segment[2] > segment[1]]
+    if not CHUNK_SIZE:
+        return [segments]
+    chunks = [[]]
+    room = CHUNK_SIZE
+    for kind, start, stop in segments:
+        while start < stop:
+            if not room:
+                chunks.append([])
+                room = CHUNK_SIZE
+            count = min(room, stop - start)
+            chunks[-1].append((kind, start, start + count))
+            start += count
+            room -= count
+    return chunks
+
+def get_eni_stems(eni_id, with_mappings):
+    """File names (minus extension) of an ENI's config: eni_<id>_combined, or eni_<id>_combined_<n> per chunk."""
+    if not CHUNK_SIZE:
+        return [f'eni_{eni_id}_combined']
+    return [f'eni_{eni_id}_combined_{index}' for index in range(1, len(get_eni_chunks(with_mappings)) + 1)]
+
+def build_eni_templates(template_dir, output_format):
+    """Renders the ENI-invariant route and mapping segments of every chunk once, keyed by (kind, start, stop)."""
+    templates = {}
+    eni, vnet = ENI_PLACEHOLDER.decode(), VNET_PLACEHOLDER.decode()
+    # ENIs without mappings split their routes at the same points, so their segments are a subset
+    for segments in get_eni_chunks(True):
+        for kind, start, stop in segments:
+            path = os.path.join(template_dir, f'{kind}_{start}.tpl')
+            if kind == 'routes':
+                blocks = iter_route_blocks(eni, vnet, start, stop, output_format)
+            else:
+                blocks = iter_mapping_blocks(vnet, start, stop, output_format)
+            write_template(path, blocks, output_format)
+            templates[kind, start, stop] = path
+    return templates
+
+def build_ir_segments():
+    """Packs the ENI-invariant address arrays of every chunk segment once, keyed by (kind, start, stop)."""
+    return {segment: (route_ir_arrays if segment[0] == 'routes' else POLICY.mapping_ir_arrays)(*segment[1:])
+            for segments in get_eni_chunks(True) for segment in segments}
+
+def write_chunk(f, templates, segments, layout, eni_id, vnet_id):
+    """Writes one chunk of an ENI's config, framed as a complete file of its layout."""
+    if not segments:
+        f.write(layout['empty'].encode())
+        return
+    f.write(layout['open'].encode())
+    for index, segment in enumerate(segments):
+        if index:
+            f.write(layout['separator'].encode())
+        copy_template(f, templates[segment], eni_id, vnet_id)
+    f.write(layout['close'].encode())
+
+def collect_addresses(arrays, count):
+    """Packs the address arrays of ids [0, count) a block at a time into one uint32 array per address column."""
+    columns = [np.empty(count, dtype='<u4') if np is not None else array.array('I') for _ in arrays(0, 0)]
+    for start in range(0, count, VALIDATE_BLOCK_SIZE):
+        stop = min(start + VALIDATE_BLOCK_SIZE, count)
+        for column, block in zip(columns, arrays(start, stop)):
+            if np is not None:
+                column[start:stop] = np.frombuffer(block, dtype='<u4')
+            else:
+                column.frombytes(block)
+    if np is None and sys.byteorder == 'big':
+        for column in columns:
+            column.byteswap()
+    return columns
+
+def get_address_stats(addresses):
+    """Returns the distinct addresses, the entries sharing theirs with another entry, and the most repeated
+    (address, count), from a sort of the whole column (a counting set without NumPy)."""
+    if np is not None:
+        values, counts = np.unique(addresses, return_counts=True)
+        if not len(values):
+            return 0, 0, None
+        top = int(counts.argmax())
+        return len(values), int(counts[counts > 1].sum()), (int(values[top]), int(counts[top]))
+    counts = collections.Counter(addresses)
+    if not counts:
+        return 0, 0, None
+    return len(counts), sum(count for count in counts.values() if count > 1), counts.most_common(1)[0]
+
+def format_address(address):
+    return f"{address >> 24}.{address >> 16 & 255}.{address >> 8 & 255}.{address & 255}"
+
+def validate_run():
+    """Checks the whole run for duplicate table keys and shared underlay IPs, prints the CRM totals
+    monitorBulker.py should expect, and returns the number of duplicate keys."""
+    num_mapping_vnets = len(get_mapping_enis(range(1, NUM_ENIS + 1)))
+    # Overlay and underlay addresses only depend on the entry id, so one ENI (VNET) stands for all of them
+    route_overlays, = collect_addresses(route_ir_arrays, NUM_OUTBOUND_ROUTES_PER_ENI)
+    mapping_overlays, mapping_underlays = collect_addresses(POLICY.mapping_ir_arrays, NUM_VNET_MAPPINGS_PER_ENI)
+    routes, route_collisions, route_top = get_address_stats(route_overlays)
+    mappings, mapping_collisions, mapping_top = get_address_stats(mapping_overlays)
+    underlays, underlay_shares, underlay_top = get_address_stats(mapping_underlays)
+    duplicates = (NUM_OUTBOUND_ROUTES_PER_ENI - routes) * NUM_ENIS
+    duplicates += (NUM_VNET_MAPPINGS_PER_ENI - mappings) * num_mapping_vnets
+
+    report = f"Route keys: {routes} distinct of {NUM_OUTBOUND_ROUTES_PER_ENI} per ENI"
+    if route_collisions:
+        report += (f"; {route_collisions} routes per ENI collide (the 13.x.y.z prefix wraps), "
+                   f"most often {format_address(route_top[0])}/32 x{route_top[1]}")
+    print(report)
+    report = f"Mapping keys: {mappings} distinct of {NUM_VNET_MAPPINGS_PER_ENI} per VNET"
+    if mapping_collisions:
+        report += (f"; {mapping_collisions} mappings per VNET collide (the 13.x.y.z prefix wraps), "
+                   f"most often {format_address(mapping_top[0])} x{mapping_top[1]}")
+    print(report)
+    if underlay_shares:
+        print(f"Underlay IPs: {underlays} distinct per VNET; {underlay_shares} mappings share theirs with another "
+              f"mapping of the VNET, most often {format_address(underlay_top[0])} x{underlay_top[1]}")
+    else:
+        print(f"Underlay IPs: {underlays} distinct per VNET, none shared within a VNET")
+    if num_mapping_vnets > 1 and underlays:
+        print(f"  (underlays only depend on the mapping id, so each one is reused by all {num_mapping_vnets} VNETs)")
+    print(f"Expected CRM totals: {routes * NUM_ENIS} routes, {mappings * num_mapping_vnets} mappings "
+          f"({duplicates} entries of the configs are duplicate keys)")
+    print(f"  python3 monitorBulker.py --routes {routes} --mappings {mappings} --total-enis {NUM_ENIS} --num-vnets {NUM_VNETS}")
+    return duplicates
+
+def print_format_stats(format_stats):
+    """Prints the size and write time of each output format, to help pick one."""
+    print(f"{'Format':<14}{'Size (MB)':>12}{'Write time (s)':>16}")
+    for output_format, size, seconds in format_stats:
+        print(f"{output_format:<14}{size / 1e6:>12.1f}{seconds:>16.2f}")
+
+def get_vnet_id(eni_id):
+    """ENIs beyond NUM_VNETS wrap around and share the existing VNETs."""
+    return eni_id if eni_id <= NUM_VNETS else ((eni_id - 1) % NUM_VNETS) + 1
+
+def get_mapping_enis(eni_ids):
+    """Returns the ENIs that emit their VNET's mappings: only the first ENI seen on each VNET does."""
+    emitted_vnets = set()
+    mapping_enis = set()
+    for eni_id in eni_ids:
+        vnet_id = get_vnet_id(eni_id)
+        if vnet_id not in emitted_vnets:
+            emitted_vnets.add(vnet_id)
+            mapping_enis.add(eni_id)
+    return mapping_enis
+
+def iter_initial_configs(num_enis, generate_guid):
+    """Lazily yields the initial config: routing type, appliance, all VNETs, all ENIs and all route groups, with
+    GUIDs from generate_guid(name)."""
+    yield from generate_routing_type_table()
+    yield from generate_appliance_table()
+    for vnet_id in range(1, NUM_VNETS + 1):
+        yield generate_vnet_table(vnet_id, generate_guid)
+    for eni_id in range(1, num_enis + 1):
+        vnet_id = get_vnet_id(eni_id)
+        yield generate_eni_table(eni_id, vnet_id)
+        yield generate_route_group_table(eni_id, generate_guid)
+
+def publish_file(tmp_path, name):
+    """Moves a finished file into place and returns its manifest entry: size and mtime."""
+    path = os.path.join(INITIAL_OUTPUT_DIR, name)
+    # Renaming last means an interrupted run never leaves a truncated file under the final name
+    os.replace(tmp_path, path)
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def write_eni_config(templates, mapping_enis, output_format, work_dir, publish, eni_id):
+    """Stamps out the eni_<id>_combined file(s); also the unit of work for the --jobs process pool.
+
+    Returns (file name, manifest entry) pairs for the files written.
+    """
+    vnet_id = get_vnet_id(eni_id)
+    layout = get_layout(output_format)
+    # ENIs sharing an already emitted VNET only carry routes; re-sending the mappings is a no-op on the DPU.
+    with_mappings = eni_id in mapping_enis
+    written = []
+    for stem, segments in zip(get_eni_stems(eni_id, with_mappings), get_eni_chunks(with_mappings)):
+        name = get_file_name(stem, output_format)
+        tmp_path = os.path.join(work_dir, name)
+        with open_output(tmp_path, output_format) as f:
+            write_chunk(f, templates, segments, layout, eni_id, vnet_id)
+        written.append((name, publish(tmp_path, name)))
+    return written
+
+def write_eni_ir(ir_segments, mapping_enis, work_dir, publish, eni_id):
+    """Writes the eni_<id>_combined IR file(s): routes, then mapping overlays, then mapping underlays.
+
+    Returns (file name, manifest entry) pairs for the files written.
+    """
+    with_mappings = eni_id in mapping_enis
+    written = []
+    for stem, segments in zip(get_eni_stems(eni_id, with_mappings), get_eni_chunks(with_mappings)):
+        routes = [segment for segment in segments if segment[0] == 'routes']
+        mappings = [segment for segment in segments if segment[0] == 'mappings']
+        header = {
+            "eni": eni_id,
+            "vnet": get_vnet_id(eni_id),
+            "routes": sum(stop - start for _, start, stop in routes),
+            "mappings": sum(stop - start for _, start, stop in mappings),
+            "route_format": ROUTE_IR_FORMAT,
+            "mapping_format": MAPPING_IR_FORMAT
+        }
+        arrays = [ir_segments[segment][0] for segment in routes + mappings]
+        arrays += [ir_segments[segment][1] for segment in mappings]
+        name = get_file_name(stem, 'ir')
+        tmp_path = os.path.join(work_dir, name)
+        write_ir(tmp_path, header, arrays)
+        written.append((name, publish(tmp_path, name)))
+    return written
+
+def write_eni_configs(eni_ids, mapping_enis, output_format, publish=publish_file):
+    """Writes the per-ENI files serially or, with --jobs > 1, spread over a process pool. Each file is finished
+    under its final name in a scratch directory, which is the name a .gz header records, and publish(tmp_path, name)
+    then moves it into place.
+
+    Returns (file name, manifest entry) pairs for the files written.
+    """
+    if not eni_ids:
+        return []
+    with tempfile.TemporaryDirectory(prefix='.templates-', dir=INITIAL_OUTPUT_DIR) as template_dir:
+        if output_format == 'ir':
+            write_one = functools.partial(write_eni_ir, build_ir_segments(), mapping_enis, template_dir, publish)
+        else:
+            templates = build_eni_templates(template_dir, output_format)
+            write_one = functools.partial(write_eni_config, templates, mapping_enis, output_format, template_dir, publish)
+        if JOBS <= 1:
+            return [entry for eni_id in eni_ids for entry in write_one(eni_id)]
+        # Hand out several ENIs per task so large runs are not dominated by IPC round trips.
+        chunksize = max(1, len(eni_ids) // (JOBS * 4))
+        # Fork so workers inherit the run parameters and policy main() set, which a fresh import would not see.
+        with multiprocessing.get_context('fork').Pool(JOBS) as pool:
+            return [entry for written in pool.imap_unordered(write_one, eni_ids, chunksize) for entry in written]
+
+def del_config(config):
+    """Turns a SET config into the DEL of its key."""
+    return {next(iter(config)): {}, "OP": "DEL"}
+
+def iter_delta_set_blocks(old_routes, old_mappings, old_enis):
+    """Yields the SET entries that the current parameters add on top of the old ones, in apply order."""
+    new_eni_configs = []
+    for eni_id in range(old_enis + 1, NUM_ENIS + 1):
+        new_eni_configs.append(generate_eni_table(eni_id, get_vnet_id(eni_id)))
+        new_eni_configs.append(generate_route_group_table(eni_id, POLICY.generate_guid))
+    if new_eni_configs:
+        yield ',\n'.join(render_config(config) for config in new_eni_configs)
+    for eni_id in range(1, NUM_ENIS + 1):
+        start = old_routes if eni_id <= old_enis else 0
+        yield from iter_route_blocks(eni_id, get_vnet_id(eni_id), start, NUM_OUTBOUND_ROUTES_PER_ENI)
+    old_vnets = min(old_enis, NUM_VNETS)
+    # Kept mappings whose content the new parameters change are sent again
+    changed_start, changed_stop = POLICY.get_changed_mappings(old_mappings, old_enis)
+    for vnet_id in range(1, min(NUM_ENIS, NUM_VNETS) + 1):
+        start = old_mappings if vnet_id <= old_vnets else 0
+        if vnet_id <= old_vnets:
+            yield from iter_mapping_blocks(vnet_id, changed_start, changed_stop)
+        yield from iter_mapping_blocks(vnet_id, start, NUM_VNET_MAPPINGS_PER_ENI)
+
+def iter_delta_del_blocks(old_routes, old_mappings, old_enis):
+    """Yields the DEL entries for keys of the old parameters that the current ones no longer have."""
+    for eni_id in range(1, old_enis + 1):
+        start = NUM_OUTBOUND_ROUTES_PER_ENI if eni_id <= NUM_ENIS else 0
+        yield from iter_element_blocks(ROUTE_DEL_FORMAT, POLICY.overlay_octets, start, old_routes, (eni_id,))
+    new_vnets = min(NUM_ENIS, NUM_VNETS)
+    for vnet_id in range(1, min(old_enis, NUM_VNETS) + 1):
+        start = NUM_VNET_MAPPINGS_PER_ENI if vnet_id <= new_vnets else 0
+        yield from iter_element_blocks(MAPPING_DEL_FORMAT, POLICY.overlay_octets, start, old_mappings, (vnet_id,))
+    # Route groups and ENIs go last, once nothing refers to them anymore
+    removed_eni_ids = range(NUM_ENIS + 1, old_enis + 1)
+    removed_configs = [del_config(generate_route_group_table(eni_id, POLICY.generate_guid)) for eni_id in removed_eni_ids]
+    removed_configs += [del_config(generate_eni_table(eni_id, get_vnet_id(eni_id))) for eni_id in removed_eni_ids]
+    if removed_configs:
+        yield ',\n'.join(render_config(config) for config in removed_configs)
+
+def write_delta_configs(old_routes, old_mappings, old_enis):
+    """Writes the DEL and SET files that step a DPU from the old parameters to the current ones."""
+    if os.path.exists(DELTA_OUTPUT_DIR):
+        shutil.rmtree(DELTA_OUTPUT_DIR)
+    os.makedirs(DELTA_OUTPUT_DIR)
+    del_path = os.path.join(DELTA_OUTPUT_DIR, 'delta_del.json')
+    set_path = os.path.join(DELTA_OUTPUT_DIR, 'delta_set.json')
+    write_json_blocks(del_path, iter_delta_del_blocks(old_routes, old_mappings, old_enis))
+    write_json_blocks(set_path, iter_delta_set_blocks(old_routes, old_mappings, old_enis))
+    print(f"Wrote the delta from {old_routes} routes / {old_mappings} mappings / {old_enis} ENIs to "
+          f"{NUM_OUTBOUND_ROUTES_PER_ENI} / {NUM_VNET_MAPPINGS_PER_ENI} / {NUM_ENIS}. Apply it in this order:")
+    for path in (del_path, set_path):
+        print(f'  ./gnmi-configurator --host "{HOSTNAME}" --dpu "{DPU_NUMBER}" --port "8080" --json "{path}" --chunksize "25000"')
+
+# The parts of apply_configs.sh that depend on how an ENI is confirmed: 'counters' waits for the cumulative
+# CRM counters to reach its targets, 'summary' for its COMPLETED line in the DPU's eni_summary.log
+APPLY_SCRIPT_VERIFY = {
+    'counters': {
+        'dpu_settings': '''
+# Runs on the DPU for the whole apply: answers every request line with both CRM counters (one HMGET)
+DPU_CHANNEL_LOOP='while read -r _; do sonic-db-cli COUNTERS_DB HMGET CRM:STATS crm_stats_dash_ipv4_outbound_routing_used crm_stats_dash_ipv4_outbound_ca_to_pa_used; echo __END__; done'
+# Set DPU_CHANNEL_CMD to run the loop some other way, e.g. against a stand-in counter source when testing
+''',
+        'crm_log_columns': 'ENI_ID,ROUTES_EXPECTED,ROUTES_APPLIED_TIME_SEC,MAPPINGS_EXPECTED,MAPPINGS_APPLIED_TIME_SEC',
+        'channel_comment': '''# One ssh session (host -> DPU double hop) is opened for the whole run instead of two per check
+''',
+        'channel_ssh': '''            sshpass -p "$PASSWORD" ssh -T -o StrictHostKeyChecking=no ${{HOST_USER}}@${{HOST}} \
+                "sshpass -p '$PASSWORD' ssh -T -o StrictHostKeyChecking=no ${{DPU_USER}}@${{DPU_IP}} '$DPU_CHANNEL_LOOP'" 2>/dev/null''',
+        'apply_loop': '''read_crm_counts() {{
+    CRM_ROUTES=""
+    CRM_MAPPINGS=""
+    if dpu_request; then
+        {{ read -r CRM_ROUTES; read -r CRM_MAPPINGS; }} <<< "$DPU_REPLY"
+    fi
+}}
+
+echo "Applying per-ENI configs and measuring timing..."
+expected_routes=0
+expected_mappings=0
+total_all_eni_time=0
+for eni_id in $(seq 1 {NUM_ENIS}); do
+    start_time=$(date +%s)
+    apply_eni_config $eni_id || {{ echo "Giving up on ENI $eni_id."; exit 1; }}
+    expected_routes=$((expected_routes + {NUM_OUTBOUND_ROUTES_PER_ENI}))
+    # ENIs past {NUM_VNETS} reuse an earlier ENI's VNET and carry no mappings of their own
+    if [ $eni_id -le {NUM_VNETS} ]; then
+        expected_mappings=$((expected_mappings + {NUM_VNET_MAPPINGS_PER_ENI}))
+    fi
+    while true; do
+        read_crm_counts
+        echo "[CRM ROUTES] Received: $CRM_ROUTES, Expected: $expected_routes"
+        echo "[CRM MAPPINGS] Received: $CRM_MAPPINGS, Expected: $expected_mappings"
+        if [ "$CRM_ROUTES" == "$expected_routes" ] && [ "$CRM_MAPPINGS" == "$expected_mappings" ]; then
+            break
+        fi
+        echo "Waiting for both route and mapping counters to reach expected values for ENI $eni_id..."
+        sleep 2
+    done
+    end_time=$(date +%s)
+    total_time=$((end_time - start_time))
+    total_all_eni_time=$((total_all_eni_time + total_time))
+    echo "ENI $eni_id: Both counters reached expected values in $total_time seconds."
+    echo "$eni_id,$expected_routes,$expected_routes,$expected_mappings,$expected_mappings,$total_time" >> "$CRM_LOG"
+done
+
+echo "Total time for all ENIs: $total_all_eni_time seconds."
+echo "All configurations applied successfully. Timing results in $CRM_LOG."
+''',
+    },
+    'summary': {
+        'dpu_settings': '''DPU_SSH_PORT=$((5021 + {DPU_NUMBER}))
+
+DPU_COMMAND_ROUTES='sonic-db-cli COUNTERS_DB HGET "CRM:STATS" "crm_stats_dash_ipv4_outbound_routing_used"'
+DPU_COMMAND_MAPPINGS='sonic-db-cli COUNTERS_DB HGET "CRM:STATS" "crm_stats_dash_ipv4_outbound_ca_to_pa_used"'
+
+# Runs on the DPU for the whole apply: answers every request line with the current ENI summary log
+DPU_CHANNEL_LOOP='while read -r _; do cat /home/admin/eni_summary.log 2>/dev/null; echo __END__; done'
+# Set DPU_CHANNEL_CMD to run the loop some other way, e.g. against a stand-in summary log when testing
+''',
+        'crm_log_columns': 'ENI_ID,ROUTES_EXPECTED,ROUTES_APPLIED_TIME_SEC,MAPPINGS_EXPECTED,MAPPINGS_APPLIED_TIME_SEC,TOTAL_TIME_SEC',
+        'channel_comment': '''#check_route_mappings() {{
+#    local expected_value=$1
+#    local cmd="sshpass -p '$PASSWORD' ssh -T -n -o LogLevel=ERROR -o StrictHostKeyChecking=no -o PubkeyAuthentication=no -o PreferredAuthentications=password ${{DPU_USER}}@${{HOST}} \"$DPU_COMMAND_ROUTES\""
+#    OUTPUT=$(sshpass -p "$PASSWORD" ssh -T -n -o LogLevel=ERROR -o StrictHostKeyChecking=no -o PubkeyAuthentication=no -o PreferredAuthentications=password ${{HOST_USER}}@${{HOST}} "$cmd" 2>&1 | tr -d '\r')
+#    echo "[CRM ROUTES] Received: $OUTPUT, Expected: $expected_value"
+#    if [ "$OUTPUT" == "$expected_value" ]; then
+#        return 0
+#    else
+#        return 1
+#    fi
+#}}
+
+#check_ca2pa_mappings() {{
+#    local expected_value=$1
+#    local cmd="sshpass -p '$PASSWORD' ssh -T -n -o LogLevel=ERROR -o StrictHostKeyChecking=no -o PubkeyAuthentication=no -o PreferredAuthentications=password ${{DPU_USER}}@${{HOST}} \"$DPU_COMMAND_MAPPINGS\""
+#    OUTPUT=$(sshpass -p "$PASSWORD" ssh -T -n -o LogLevel=ERROR -o StrictHostKeyChecking=no -o PubkeyAuthentication=no -o PreferredAuthentications=password ${{HOST_USER}}@${{HOST}} "$cmd" 2>&1 | tr -d '\r')
+#    echo "[CRM MAPPINGS] Received: $OUTPUT, Expected: $expected_value"
+#    if [ "$OUTPUT" == "$expected_value" ]; then
+#        return 0
+#    else
+#        return 1
+#    fi
+#}}
+
+#run_on_dpu() {{
+#    local cmd="$1"
+#    sshpass -p "$PASSWORD" ssh -o StrictHostKeyChecking=no -o PubkeyAuthentication=no -o PreferredAuthentications=password ${{HOST_USER}}@${{HOST}} \
+#        "sshpass -p '$PASSWORD' ssh -o StrictHostKeyChecking=no -o PubkeyAuthentication=no -o PreferredAuthentications=password ${{DPU_USER}}@${{HOST}} \"$cmd\"" 2>/dev/null | tr -d '\r'
+#}}
+
+# One ssh session is opened for the whole run instead of one per check
+''',
+        'channel_ssh': '            sshpass -p "$PASSWORD" ssh -T -p $DPU_SSH_PORT -o LogLevel=ERROR -o StrictHostKeyChecking=no -o PubkeyAuthentication=no -o PreferredAuthentications=password ${{DPU_USER}}@${{HOST}} "$DPU_CHANNEL_LOOP"',
+        'apply_loop': '''echo "Applying per-ENI configs..."
+for eni_id in $(seq 1 {NUM_ENIS}); do
+    apply_eni_config $eni_id || {{ echo "Giving up on ENI $eni_id."; exit 1; }}
+    while true; do
+        log_found=""
+        if dpu_request; then
+            log_found=$(grep -E "^ENI ${{eni_id}} COMPLETED" <<< "$DPU_REPLY")
+        fi
+        if [[ -n "$log_found" ]]; then
+            echo "ENI $eni_id COMPLETED log found on DPU."
+            break
+        fi
+        echo "Waiting for ENI $eni_id COMPLETED log on DPU..."
+        sleep 5
+    done
+done
+
+echo "All configurations applied successfully."
+''',
+    },
+}
+
+def write_apply_script(verify):
+    """Writes apply_configs.sh, which applies the configs and then confirms each ENI as verify (see
+    APPLY_SCRIPT_VERIFY) says."""
+    fields = {
+        'HOSTNAME': HOSTNAME,
+        'DPU_NUMBER': DPU_NUMBER,
+        'NUM_ENIS': NUM_ENIS,
+        'NUM_VNETS': NUM_VNETS,
+        'CONFIG_EXT': get_file_name('', OUTPUT_FORMATS[0]),
+        'RENDER_IR_SCRIPT': RENDER_IR_SCRIPT,
+        'CHUNKSIZE': CHUNK_SIZE or 25000,
+        'CHUNKED': 1 if CHUNK_SIZE else 0,
+        'NUM_OUTBOUND_ROUTES_PER_ENI': NUM_OUTBOUND_ROUTES_PER_ENI,
+        'NUM_VNET_MAPPINGS_PER_ENI': NUM_VNET_MAPPINGS_PER_ENI,
+        'dpu_ip_last_octet': DPU_NUMBER + 1,
+    }
+    verify_parts = {name: part.format(**fields) for name, part in APPLY_SCRIPT_VERIFY[verify].items()}
+    with open('apply_configs.sh', 'w') as f:
+        f.write('''#!/bin/bash
+
+# Ensure sshpass is installed
+if ! command -v sshpass &> /dev/null; then
+    echo "sshpass could not be found, attempting to install..."
+    if [ -f /etc/debian_version ]; then
+        sudo apt-get update && sudo apt-get install -y sshpass
+    elif [ -f /etc/redhat-release ]; then
+        sudo yum install -y sshpass
+    else
+        echo "Please install sshpass manually. Exiting."
+        exit 1
+    fi
+fi
+
+HOST="{HOSTNAME}"
+DPU="{DPU_NUMBER}"
+PORT="8080"
+INITIAL_CONFIG_DIR="split_configs"
+CHUNKSIZE="{CHUNKSIZE}"
+CHUNKED="{CHUNKED}"
+# --chunksize given to gnmi-configurator; applyConfigs.py --tune-chunk-sizes rewrites it
+PUSH_CHUNKSIZE="{CHUNKSIZE}"
+MAX_PUSH_ATTEMPTS="3"
+CONFIG_EXT="{CONFIG_EXT}"
+CRM_LOG="crm_apply_timings.csv"
+PASSWORD="YourPaSsWoRd"
+HOST_USER="admin"
+DPU_USER="admin"
+DPU_IP="169.254.200.{dpu_ip_last_octet}"
+{dpu_settings}DPU_CHANNEL_CMD="${{DPU_CHANNEL_CMD:-}}"
+
+trap 'echo "Interrupt received, stopping..."; exit 1' INT
+
+# gnmi-configurator reads plain JSON arrays, so compressed, NDJSON and IR configs are unpacked here first
+RENDER_IR="${{RENDER_IR:-{RENDER_IR_SCRIPT}}}"
+WORK_DIR=$(mktemp -d)
+trap 'stop_dpu_channel; rm -rf "$WORK_DIR"' EXIT
+
+prepare_config() {{
+    local src=$1
+    local name=$(basename "$src")
+    case "$src" in
+        *.gz) gzip -dc "$src" > "$WORK_DIR/${{name%.gz}}"; src="$WORK_DIR/${{name%.gz}}"; name="${{name%.gz}}" ;;
+        *.zst) zstd -qdc "$src" > "$WORK_DIR/${{name%.zst}}"; src="$WORK_DIR/${{name%.zst}}"; name="${{name%.zst}}" ;;
+    esac
+    case "$src" in
+        *.ir)
+            python3 "$RENDER_IR" "$src" -o "$WORK_DIR/${{name%.ir}}.json"
+            src="$WORK_DIR/${{name%.ir}}.json" ;;
+        *.ndjson)
+            {{ printf '['; paste -sd, "$src"; printf ']'; }} > "$WORK_DIR/${{name%.ndjson}}.json"
+            [ "$src" != "$1" ] && rm -f "$src"
+            src="$WORK_DIR/${{name%.ndjson}}.json" ;;
+    esac
+    echo "$src"
+}}
+
+eni_config_file() {{
+    local eni_id=$1
+    local chunk=$2
+    if [ "$CHUNKED" -eq 1 ]; then
+        echo "$INITIAL_CONFIG_DIR/eni_${{eni_id}}_combined_${{chunk}}$CONFIG_EXT"
+    else
+        echo "$INITIAL_CONFIG_DIR/eni_${{eni_id}}_combined$CONFIG_EXT"
+    fi
+}}
+
+eni_num_chunks() {{
+    local eni_id=$1
+    local entries={NUM_OUTBOUND_ROUTES_PER_ENI}
+    # ENIs past {NUM_VNETS} reuse an earlier ENI's VNET and carry no mappings of their own
+    if [ $eni_id -le {NUM_VNETS} ]; then
+        entries=$((entries + {NUM_VNET_MAPPINGS_PER_ENI}))
+    fi
+    if [ "$CHUNKED" -eq 0 ] || [ $entries -eq 0 ]; then
+        echo 1
+    else
+        echo $(( (entries + CHUNKSIZE - 1) / CHUNKSIZE ))
+    fi
+}}
+
+push_config() {{
+    local config_file=$1
+    for attempt in $(seq 1 $MAX_PUSH_ATTEMPTS); do
+        if ./gnmi-configurator --host "$HOST" --dpu "$DPU" --port "$PORT" --json "$config_file" --chunksize "$PUSH_CHUNKSIZE"; then
+            return 0
+        fi
+        echo "Pushing $config_file failed (attempt $attempt of $MAX_PUSH_ATTEMPTS)."
+        sleep 2
+    done
+    return 1
+}}
+
+# Pushes an ENI chunk by chunk, unpacking the next chunk while the current one is in flight.
+# A failed chunk is retried on its own instead of re-pushing the whole ENI.
+apply_eni_config() {{
+    local eni_id=$1
+    local num_chunks=$(eni_num_chunks $eni_id)
+    local current=$(prepare_config "$(eni_config_file $eni_id 1)")
+    local prepare_pid=""
+    for chunk in $(seq 1 $num_chunks); do
+        if [ $chunk -lt $num_chunks ]; then
+            prepare_config "$(eni_config_file $eni_id $((chunk + 1)))" > "$WORK_DIR/next_chunk" &
+            prepare_pid=$!
+        fi
+        echo "Applying $(eni_config_file $eni_id $chunk) (chunk $chunk of $num_chunks)..."
+        if ! push_config "$current"; then
+            [ -n "$prepare_pid" ] && wait $prepare_pid
+            return 1
+        fi
+        case "$current" in
+            "$WORK_DIR"/*) rm -f "$current" ;;
+        esac
+        if [ $chunk -lt $num_chunks ]; then
+            wait $prepare_pid
+            current=$(cat "$WORK_DIR/next_chunk")
+        fi
+    done
+}}
+
+echo "CRM Apply Timings" > "$CRM_LOG"
+echo "{crm_log_columns}" >> "$CRM_LOG"
+
+echo "Applying initial configuration..."
+push_config "$(prepare_config "$INITIAL_CONFIG_DIR/config_part_1$CONFIG_EXT")" || exit 1
+rm -f "$WORK_DIR"/*
+
+{channel_comment}start_dpu_channel() {{
+    if [ -n "$DPU_CHANNEL_CMD" ]; then
+        coproc DPU_CHANNEL {{ eval "$DPU_CHANNEL_CMD"; }}
+    else
+        coproc DPU_CHANNEL {{
+{channel_ssh}
+        }}
+    fi
+}}
+
+stop_dpu_channel() {{
+    if [ -n "$DPU_CHANNEL_PID" ]; then
+        kill $DPU_CHANNEL_PID 2>/dev/null
+        wait $DPU_CHANNEL_PID 2>/dev/null
+    fi
+}}
+
+# Sends one request over the channel and collects the reply lines in DPU_REPLY; restarts the channel if it is gone
+dpu_request() {{
+    local line
+    DPU_REPLY=""
+    if [ -z "$DPU_CHANNEL_PID" ]; then
+        start_dpu_channel
+    fi
+    if echo >&"${{DPU_CHANNEL[1]}}" 2>/dev/null; then
+        while IFS= read -r -t 30 line <&"${{DPU_CHANNEL[0]}}"; do
+            line=${{line%$'\r'}}
+            if [ "$line" == "__END__" ]; then
+                return 0
+            fi
+            DPU_REPLY+="$line"$'\n'
+        done
+    fi
+    stop_dpu_channel
+    return 1
+}}
+
+{apply_loop}'''.format(**fields, **verify_parts))
+    os.chmod('apply_configs.sh', 0o755)
+    print("Generated 'apply_configs.sh' to apply the configurations and log CRM timing.")
+
+def write_apply_plan(verify):
+    """Writes apply_plan.json, the files and cumulative CRM targets of every ENI for applyConfigs.py, which
+    (like apply_configs.sh) confirms each ENI from the CRM counters or from its COMPLETED line in the DPU's
+    eni_summary.log, as verify says."""
+    config_ext = get_file_name('', OUTPUT_FORMATS[0])
+    mapping_enis = get_mapping_enis(range(1, NUM_ENIS + 1))
+    password = 'YourPaSsWoRd'
+    summary_loop = "while read -r _; do cat /home/admin/eni_summary.log 2>/dev/null; echo __END__; done"
+    if verify == 'counters':
+        dpu_command = ("sonic-db-cli COUNTERS_DB HMGET CRM:STATS "
+                       "crm_stats_dash_ipv4_outbound_routing_used crm_stats_dash_ipv4_outbound_ca_to_pa_used")
+        # Same host -> DPU double hop as apply_configs.sh, both counters coming back from a single HMGET, either
+        # per check or through one session kept open for the whole run
+        def dpu_ssh(command):
+            return (f"sshpass -p '{password}' ssh -T -o StrictHostKeyChecking=no admin@{HOSTNAME} "
+                    f"\"sshpass -p '{password}' ssh -T -o StrictHostKeyChecking=no admin@169.254.200.{DPU_NUMBER + 1} '{command}'\"")
+        verify_command = dpu_ssh(dpu_command)
+        channel_command = dpu_ssh(f"while read -r _; do {dpu_command}; echo __END__; done")
+        summary_channel_command = dpu_ssh(summary_loop)
+    else:
+        # Either a session per check, or one kept open for the whole run (without -n, its stdin carries the requests)
+        def dpu_ssh(command, options):
+            return (f"sshpass -p '{password}' ssh {options} -p {5021 + DPU_NUMBER} -o LogLevel=ERROR -o StrictHostKeyChecking=no "
+                    f"-o PubkeyAuthentication=no -o PreferredAuthentications=password admin@{HOSTNAME} '{command}'")
+        verify_command = dpu_ssh("cat /home/admin/eni_summary.log", "-T -n")
+        channel_command = summary_channel_command = dpu_ssh(summary_loop, "-T")
+    enis = []
+    routes = mappings = 0
+    for eni_id in range(1, NUM_ENIS + 1):
+        routes += NUM_OUTBOUND_ROUTES_PER_ENI
+        if eni_id in mapping_enis:
+            mappings += NUM_VNET_MAPPINGS_PER_ENI
+        enis.append({
+            "eni": eni_id,
+            "files": [os.path.join(INITIAL_OUTPUT_DIR, stem + config_ext) for stem in get_eni_stems(eni_id, eni_id in mapping_enis)],
+            "routes": routes,
+            "mappings": mappings
+        })
+    plan = {
+        "host": HOSTNAME,
+        "dpu": DPU_NUMBER,
+        "port": 8080,
+        "chunk_size": CHUNK_SIZE or 25000,
+        "initial_config": os.path.join(INITIAL_OUTPUT_DIR, 'config_part_1' + config_ext),
+        "verify": verify,
+        "verify_command": verify_command,
+        "channel_command": channel_command,
+        "summary_channel_command": summary_channel_command,
+        "enis": enis
+    }
+    with open(APPLY_PLAN_FILE, 'w') as f:
+        json.dump(plan, f, indent=4)
+    print(f"Generated '{APPLY_PLAN_FILE}' for applyConfigs.py, which pipelines the ENI pushes.")
+
+def parse_args(argv=None, add_arguments=None):
+    """Parses and validates the command line; add_arguments(parser) adds a generator's own options."""
+    parser = argparse.ArgumentParser(description="Generates DASH configs and the script that applies them.")
+    parser.add_argument('num_routes', type=int, metavar='NUM_OUTBOUND_ROUTES_PER_ENI')
+    parser.add_argument('num_mappings', type=int, metavar='NUM_VNET_MAPPINGS_PER_ENI')
+    parser.add_argument('num_enis', type=int, metavar='NUM_ENIS')
+    parser.add_argument('dpu_number', type=int, metavar='DPU_NUMBER')
+    parser.add_argument('hostname', metavar='HOSTNAME')
+    if add_arguments:
+        add_arguments(parser)
+    parser.add_argument('--delta-from', type=int, nargs=3, metavar=('ROUTES', 'MAPPINGS', 'ENIS'),
+                        help="Only write the DEL/SET delta from these old per-ENI route/mapping counts and ENI count.")
+    parser.add_argument('--format', default='json',
+                        help="Comma-separated output formats: json, compact or ndjson, each optionally suffixed "
+                             ".gz or .zst (e.g. 'json,compact.gz,ndjson.zst'), or ir, the binary form renderIR.py "
+                             "renders on demand. The first one is used by apply_configs.sh.")
+    parser.add_argument('--chunk-size', type=int, default=0,
+                        help="Split each ENI config into files of at most this many entries, which apply_configs.sh "
+                             "pushes one after another with per-chunk retries (also sets its CHUNKSIZE).")
+    parser.add_argument('--jobs', type=int, default=1, help="Worker processes for the per-ENI files (0 = all cores).")
+    parser.add_argument('--validate', action='store_true',
+                        help="Only check the run for duplicate table keys and shared underlay IPs and print the expected "
+                             "CRM totals; exits 1 if keys collide. No files are touched.")
+    args = parser.parse_args(argv)
+    for output_format in args.format.split(','):
+        layout_name, _, compression = output_format.partition('.')
+        if layout_name not in ('json', 'compact', 'ndjson', 'ir') or compression not in ('', 'gz', 'zst'):
+            parser.error(f"unknown output format '{output_format}'")
+        if layout_name == 'ir' and compression:
+            parser.error("the ir format is already compact and is not compressed")
+        if compression == 'zst' and zstandard is None:
+            parser.error("the .zst output formats need the 'zstandard' package")
+    return args
+
+def set_run_parameters(args):
+    """Sets the run parameters from the parsed command line."""
+    global NUM_OUTBOUND_ROUTES_PER_ENI, NUM_VNET_MAPPINGS_PER_ENI, NUM_ENIS, DPU_NUMBER, HOSTNAME
+    global JOBS, CHUNK_SIZE, DELTA_FROM, OUTPUT_FORMATS
+    NUM_OUTBOUND_ROUTES_PER_ENI = args.num_routes
+    NUM_VNET_MAPPINGS_PER_ENI = args.num_mappings
+    NUM_ENIS = args.num_enis
+    DPU_NUMBER = args.dpu_number
+    HOSTNAME = args.hostname
+    JOBS = args.jobs or os.cpu_count()
+    CHUNK_SIZE = args.chunk_size
+    DELTA_FROM = args.delta_from
+    OUTPUT_FORMATS = args.format.split(',')
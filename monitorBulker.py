@@ -1,58 +1,645 @@
 import argparse
+import atexit
+import bisect
 import subprocess
 import time
 import datetime
+import functools
+from array import array
+import json
+import math
 import re
 import os
+import queue
+import select
 import signal
+import socket
 import sys
 import threading
 
 # --- Shared State for Threads ---
-# A lock is needed to safely update and read the time sum from different threads
+# A lock is needed to safely update and read the per-ENI times from different threads
 g_lock = threading.Lock()
-g_bulker_time_sum = 0.0
-g_eni_index = 1
-g_process = None # Global process handle for cleanup
+g_took_times = {} # ENI -> bulk "took" times attributed to it
+g_eni_index = 1 # Next ENI to complete
+g_active_eni = 1 # ENI the most recently installed entries belong to, per the last counter read
+g_counters_db = None # Persistent COUNTERS_DB connection, reopened after errors
+g_counters_db_target = None # Where COUNTERS_DB lives; None means only sonic-db-cli is used
+g_crm_events = None # Connection subscribed to CRM:STATS keyspace notifications, in event-driven mode
+g_saved_keyspace_events = None # (Redis target, original notify-keyspace-events) while we have it widened
+g_log_writer = None # Background LogWriter behind write_log(), while main() runs
+g_series = None # CounterSeries of every counter read, saved to g_series_file on exit
+g_series_file = None
 
-def log_monitor_worker(ram_log_file, took_time_re):
+# --- Syslog following ---
+SYSLOG_FILE = "/var/log/syslog"
+SYSLOG_CHECKPOINT_FILE = "syslog_checkpoint.json"
+RUN_STATE_FILE = "monitor_state.json"
+SYSLOG_READ_SIZE = 1 << 20
+SYSLOG_IDLE_INTERVAL = 0.2 # Seconds between reads once the syslog has been read to its end
+RAM_TEST_MARKER = b"Ram Test"
+RAM_LOG_LINE_RE = re.compile(r"^\[ENI (\d+)\] (.*)$") # A line of ram_test.log
+COMPLETED_RE = re.compile(r"^ENI (\d+) COMPLETED\b") # A line of eni_summary.log
+
+# --- Log writing ---
+LOG_QUEUE_SIZE = 10000 # Lines; a full queue makes write_log() wait for the disk instead of growing without bound
+LOG_FLUSH_BYTES = 1 << 16
+LOG_FLUSH_INTERVAL = 1.0 # Seconds a queued line may wait before it is written
+
+# --- Metrics ---
+TOOK_QUANTILES = (0.5, 0.9, 0.99)
+MIN_RATE_DURATION = 0.1 # Seconds; shorter ENI durations are below what the counter reads resolve, so get no rate
+PROMETHEUS_PREFIX = "monitor_bulker"
+
+# --- COUNTERS_DB access ---
+DATABASE_CONFIG_FILE = "/var/run/redis/sonic-db/database_config.json"
+CRM_STATS_KEY = "CRM:STATS"
+CRM_ROUTES_FIELD = "crm_stats_dash_ipv4_outbound_routing_used"
+CRM_MAPPINGS_FIELD = "crm_stats_dash_ipv4_outbound_ca_to_pa_used"
+
+class RedisError(Exception):
+    """An error reply from Redis, or a reply we could not parse."""
+
+def encode_command(*args):
+    """A command as a RESP array of bulk strings."""
+    request = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        arg = arg if isinstance(arg, bytes) else str(arg).encode()
+        request.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(request)
+
+class RedisConnection:
+    """A minimal blocking Redis (RESP2) client over a unix socket or TCP, enough for HMGET and friends."""
+
+    def __init__(self, unix_socket=None, host="127.0.0.1", port=6379, db=0, timeout=2.0):
+        if unix_socket:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            address = unix_socket
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            address = (host, port)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(address)
+        except OSError:
+            self.sock.close()
+            raise
+        self.buffer = bytearray()
+        if db:
+            self.execute("SELECT", db)
+
+    def execute(self, *args):
+        """Sends one command and returns its decoded reply (bytes, int, list or None)."""
+        self.sock.sendall(encode_command(*args))
+        return self.read_reply()
+
+    def receive(self):
+        data = self.sock.recv(65536)
+        if not data:
+            raise ConnectionError("Redis connection closed")
+        self.buffer += data
+
+    def read_line(self):
+        end = self.buffer.find(b"\r\n")
+        while end < 0:
+            self.receive()
+            end = self.buffer.find(b"\r\n")
+        line = bytes(self.buffer[:end])
+        del self.buffer[:end + 2]
+        return line
+
+    def read_bytes(self, count):
+        while len(self.buffer) < count + 2:
+            self.receive()
+        data = bytes(self.buffer[:count])
+        del self.buffer[:count + 2]
+        return data
+
+    def has_reply(self, timeout):
+        """Waits up to timeout seconds for (part of) a reply, e.g. a pushed pub/sub message."""
+        return bool(self.buffer) or bool(select.select([self.sock], [], [], timeout)[0])
+
+    def read_reply(self):
+        line = self.read_line()
+        kind, payload = line[:1], line[1:]
+        if kind == b"+":
+            return payload
+        if kind == b"-":
+            raise RedisError(payload.decode(errors="replace"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            if int(payload) < 0:
+                return None
+            return self.read_bytes(int(payload))
+        if kind == b"*":
+            if int(payload) < 0:
+                return None
+            return [self.read_reply() for _ in range(int(payload))]
+        raise RedisError(f"Unexpected reply {line!r}")
+
+    def close(self):
+        self.sock.close()
+
+def find_counters_db(config_file=DATABASE_CONFIG_FILE):
+    """Returns the connection arguments of COUNTERS_DB from SONiC's database_config.json, or None."""
+    try:
+        with open(config_file) as f:
+            config = json.load(f)
+        database = config["DATABASES"]["COUNTERS_DB"]
+        instance = config["INSTANCES"][database["instance"]]
+    except (OSError, ValueError, KeyError):
+        return None
+    return {
+        "unix_socket": instance.get("unix_socket_path"),
+        "host": instance.get("hostname", "127.0.0.1"),
+        "port": instance.get("port", 6379),
+        "db": database["id"]
+    }
+
+def load_checkpoint(checkpoint_file):
+    """Returns the (inode, offset) saved by save_checkpoint(), or None."""
+    try:
+        with open(checkpoint_file) as f:
+            checkpoint = json.load(f)
+        return checkpoint["inode"], checkpoint["offset"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+def save_checkpoint(checkpoint_file, inode, offset, log_file):
+    """
+    Atomically records how far into which file (by inode) all lines have been handled, with the length
+    log_file has at that point. Called by the writer once the lines before the checkpoint are on disk.
+    """
+    try:
+        log_size = os.path.getsize(log_file)
+    except FileNotFoundError:
+        log_size = 0 # No lines written yet
+    with open(checkpoint_file + ".tmp", "w") as f:
+        json.dump({"inode": inode, "offset": offset, "log_size": log_size}, f)
+    os.replace(checkpoint_file + ".tmp", checkpoint_file)
+
+def trim_log_to_checkpoint(log_file, checkpoint_file):
+    """
+    Cuts log_file back to the length saved with the syslog checkpoint. Lines written past it (size-triggered
+    flushes, or the writer draining its queue on exit) are read again from the checkpoint, so keeping them
+    would count them twice.
+    """
+    try:
+        with open(checkpoint_file) as f:
+            log_size = json.load(f)["log_size"]
+    except (OSError, ValueError, KeyError):
+        return # No checkpoint: following restarts at the end of the syslog and reads nothing twice
+    try:
+        with open(log_file, "r+b") as f:
+            if os.fstat(f.fileno()).st_size > log_size:
+                f.truncate(log_size)
+    except FileNotFoundError:
+        pass
+
+def save_run_state(state_file, routes_base, mappings_base):
+    """Atomically records the CRM counts a run measures its cumulative ENI thresholds from."""
+    with open(state_file + ".tmp", "w") as f:
+        json.dump({"routes_base": routes_base, "mappings_base": mappings_base}, f)
+    os.replace(state_file + ".tmp", state_file)
+
+def load_run_state(state_file):
+    """Returns the (routes, mappings) baseline saved by save_run_state(), or None."""
+    try:
+        with open(state_file) as f:
+            state = json.load(f)
+        return state["routes_base"], state["mappings_base"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+def get_completed_enis(summary_log_file):
+    """Highest ENI with a COMPLETED line in an existing summary log, 0 if none."""
+    completed = 0
+    try:
+        with open(summary_log_file) as f:
+            for line in f:
+                m = COMPLETED_RE.match(line)
+                if m:
+                    completed = max(completed, int(m.group(1)))
+    except FileNotFoundError:
+        pass
+    return completed
+
+def load_took_times(ram_log_file, took_time_re):
+    """Rebuilds ENI -> "took" times from an existing ram test log, once trim_log_to_checkpoint() has cut it
+    to the lines the checkpoint covers."""
+    took_times = {}
+    try:
+        with open(ram_log_file, errors="replace") as f:
+            for line in f:
+                m = RAM_LOG_LINE_RE.match(line.rstrip("\n"))
+                took = took_time_re.search(m.group(2)) if m else None
+                if took:
+                    took_times.setdefault(int(m.group(1)), []).append(float(took.group(1)))
+    except FileNotFoundError:
+        pass
+    return took_times
+
+def load_eni_metrics(metrics_file):
+    """The ENI records already in an existing metrics file."""
+    try:
+        with open(metrics_file) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+def open_syslog(path, checkpoint):
+    """Opens where following should start: the checkpointed position if it is still around, else the end of path (None if path does not exist yet)."""
+    if checkpoint is not None:
+        inode, offset = checkpoint
+        # The checkpointed file may have been rotated away while we were down
+        for candidate in (path, path + ".1"):
+            try:
+                f = open(candidate, "rb")
+            except FileNotFoundError:
+                continue
+            if os.fstat(f.fileno()).st_ino == inode and os.fstat(f.fileno()).st_size >= offset:
+                f.seek(offset)
+                return f
+            f.close()
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    f.seek(0, os.SEEK_END)
+    return f
+
+class SyslogFollower:
+    """
+    Reads the "Ram Test" lines appended to a syslog file, like tail -F but in-process and without ever
+    blocking: reads large blocks, skips blocks without the marker before splitting or decoding anything,
+    and follows rotation and truncation by inode and size. take_checkpoint() hands out the offset to save
+    once the caller has durably handled the lines returned so far.
+    """
+    def __init__(self, path, checkpoint_file=None, resume=False):
+        self.path = path
+        self.checkpoint_file = checkpoint_file
+        self.checkpoint = load_checkpoint(checkpoint_file) if resume and checkpoint_file else None
+        self.f = None
+        self.inode = None
+        self.offset = 0
+        self.partial = b""
+        self.pending_checkpoint = False
+        self.last_checkpoint = 0.0
+
+    def take_checkpoint(self):
+        """Returns the (inode, offset) just past the lines returned so far if a checkpoint is due, else None."""
+        if not self.pending_checkpoint:
+            return None
+        self.pending_checkpoint = False
+        self.last_checkpoint = time.time()
+        return self.inode, self.offset
+
+    def read_lines(self):
+        """Returns the matching lines (as bytes, without the newline) of the next block, or None when there is nothing new yet."""
+        if self.f is None:
+            self.f = open_syslog(self.path, self.checkpoint)
+            if self.f is None:
+                return None
+            self.inode = os.fstat(self.f.fileno()).st_ino
+            self.offset = self.f.tell()
+        block = self.f.read(SYSLOG_READ_SIZE)
+        if block:
+            block = self.partial + block
+            end = block.rfind(b"\n") + 1
+            block, self.partial = block[:end], block[end:]
+            lines = []
+            if RAM_TEST_MARKER in block:
+                lines = [line for line in block.split(b"\n") if RAM_TEST_MARKER in line]
+            self.offset += len(block)
+            if self.checkpoint_file and (lines or time.time() - self.last_checkpoint >= 1.0):
+                self.pending_checkpoint = True
+            return lines
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None # Rotated, and the new file is not there yet
+        if stat.st_ino != self.inode:
+            # Rotated: the old file is fully read (EOF above), carry on at the start of the new one
+            self.f.close()
+            self.f = open(self.path, "rb")
+            self.inode = os.fstat(self.f.fileno()).st_ino
+            self.offset = 0
+            self.partial = b""
+            return []
+        if stat.st_size < self.offset + len(self.partial):
+            self.f.seek(0) # Truncated in place
+            self.offset = 0
+            self.partial = b""
+            return []
+        return None
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+def parse_ram_test_line(raw_line, took_time_re, eni_re):
+    """Returns a "Ram Test" line as text, with its "took" time and the ENI it names (None where absent)."""
+    line = raw_line.decode(errors="replace").strip()
+    took_time = None
+    m = took_time_re.search(line)
+    if m:
+        try:
+            took_time = float(m.group(1))
+        except (ValueError, IndexError):
+            pass
+    m = eni_re.search(line) if eni_re else None
+    return line, took_time, int(m.group(1)) if m else None
+
+def log_monitor_worker(ram_log_file, took_time_re, eni_re, syslog_file, checkpoint_file, resume):
     """
     This function runs in a background thread. Its ONLY job is to watch syslog,
-    write to the detailed log, and update the shared bulker_time_sum.
+    write to the detailed log, and record each "took" time against its ENI.
     """
-    global g_bulker_time_sum, g_eni_index, g_process
+    follower = SyslogFollower(syslog_file, checkpoint_file, resume)
+    while True:
+        lines = follower.read_lines()
+        if lines is None:
+            time.sleep(SYSLOG_IDLE_INTERVAL)
+            continue
+        for raw_line in lines:
+            # Parse before taking the lock, which only covers the shared state and a queue put
+            line, took_time, line_eni = parse_ram_test_line(raw_line, took_time_re, eni_re)
 
-    g_process = subprocess.Popen(
-        ["tail", "-F", "/var/log/syslog"],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        universal_newlines=True
-    )
-    
-    for line in g_process.stdout:
-        if "Ram Test" in line:
+            # The line itself names the ENI if it can; otherwise it belongs to the ENI being installed per the
+            # counters, which stays right when a line arrives late or several ENIs complete within one poll
             with g_lock:
-                # Use the global eni_index for tagging
-                tagged_line = f"[ENI {g_eni_index}] {line.strip()}"
-                write_log(ram_log_file, tagged_line + "\n")
-                
-                # Extract and sum "took" times
-                m = took_time_re.search(line)
-                if m:
-                    try:
-                        g_bulker_time_sum += float(m.group(1))
-                    except (ValueError, IndexError):
-                        pass
+                eni = line_eni if line_eni is not None else g_active_eni
+                write_log(ram_log_file, f"[ENI {eni}] {line}\n")
+                if took_time is not None:
+                    g_took_times.setdefault(eni, []).append(took_time)
+        position = follower.take_checkpoint()
+        if position is not None:
+            # Saved by the writer once the lines before it are on disk, so a crash never skips lines it claims
+            g_log_writer.call_after_write(functools.partial(save_checkpoint, checkpoint_file, *position, ram_log_file))
+
+def get_expected_counts(eni_index, args):
+    """Cumulative route and mapping deltas at which ENIs 1..eni_index are all installed."""
+    return args.routes * eni_index, args.mappings * min(eni_index, args.num_vnets)
+
+def get_active_eni(routes_delta, mappings_delta, args):
+    """ENI that the most recently installed entries belong to, judged from the cumulative counter deltas."""
+    eni = 1
+    if args.routes:
+        eni = max(eni, -(-routes_delta // args.routes))
+    if args.mappings:
+        eni = max(eni, -(-mappings_delta // args.mappings))
+    return min(eni, args.total_enis)
+
+class CounterSeries:
+    """Every CRM counter read as compact parallel arrays: timestamp, routes used, mappings used."""
+
+    def __init__(self):
+        self.times = array("d")
+        self.routes = array("q")
+        self.mappings = array("q")
+        self.last_change = None # Time of the latest read where either counter differed from the one before
+
+    def __len__(self):
+        return len(self.times)
+
+    def append(self, timestamp, routes, mappings):
+        if self.times and (routes != self.routes[-1] or mappings != self.mappings[-1]):
+            self.last_change = timestamp
+        self.times.append(timestamp)
+        self.routes.append(routes)
+        self.mappings.append(mappings)
+
+    def rates(self, window):
+        """Routes and mappings installed per second over the last window seconds, or (None, None)."""
+        if len(self.times) < 2:
+            return None, None
+        start = min(bisect.bisect_left(self.times, self.times[-1] - window), len(self.times) - 2)
+        elapsed = self.times[-1] - self.times[start]
+        if elapsed <= 0:
+            return None, None
+        return (self.routes[-1] - self.routes[start]) / elapsed, (self.mappings[-1] - self.mappings[start]) / elapsed
+
+    def save(self, path):
+        with open(path, "w") as f:
+            f.write("timestamp,routes_used,mappings_used\n")
+            f.writelines(f"{t:.3f},{r},{m}\n" for t, r, m in zip(self.times, self.routes, self.mappings))
+
+def estimate_eta(remaining_routes, remaining_mappings, routes_rate, mappings_rate):
+    """Seconds until both remaining counts are installed at the given rates; None if either rate can't get there."""
+    eta = 0.0
+    for remaining, rate in ((remaining_routes, routes_rate), (remaining_mappings, mappings_rate)):
+        if remaining <= 0:
+            continue
+        if not rate or rate <= 0:
+            return None
+        eta = max(eta, remaining / rate)
+    return eta
+
+def format_eta(eta):
+    return "unknown" if eta is None else str(datetime.timedelta(seconds=round(eta)))
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(len(sorted_values) * fraction) - 1)]
+
+def summarize_took_times(took_times):
+    """Count, sum, p50/p90/p99 and max of an ENI's bulk "took" times."""
+    values = sorted(took_times)
+    summary = {"count": len(values), "sum": round(sum(values), 6)}
+    for fraction in TOOK_QUANTILES:
+        summary[f"p{round(fraction * 100)}"] = percentile(values, fraction)
+    summary["max"] = values[-1] if values else None
+    return summary
+
+def split_duration(elapsed, enis, args):
+    """Shares the time since the last completion among the ENIs closed out in one pass, by their entry counts,
+    rather than giving all but the first of them a duration of nothing."""
+    weights = [sum(get_expected_counts(eni, args)) - sum(get_expected_counts(eni - 1, args)) for eni in enis]
+    total = sum(weights)
+    if not total:
+        return [elapsed / len(enis)] * len(enis)
+    return [elapsed * weight / total for weight in weights]
+
+def build_eni_metrics(eni, duration, took_times, args):
+    """One ENI's completion record: timing, took-time distribution and install rates from its CRM deltas."""
+    routes = args.routes
+    mappings = args.mappings if eni <= args.num_vnets else 0
+    def rate(count):
+        return round(count / duration, 1) if duration >= MIN_RATE_DURATION else None
+    return {
+        "eni": eni,
+        "completed_at": round(time.time(), 3),
+        "duration": round(duration, 3),
+        "routes": routes,
+        "mappings": mappings,
+        "routes_per_sec": rate(routes),
+        "mappings_per_sec": rate(mappings),
+        "entries_per_sec": rate(routes + mappings),
+        "took": summarize_took_times(took_times)
+    }
+
+def write_prometheus_textfile(path, eni_metrics):
+    """Atomically rewrites a node_exporter textfile collector file with the metrics of all completed ENIs."""
+    lines = []
+    def family(name, kind, help_text):
+        lines.append(f"# HELP {PROMETHEUS_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} {kind}")
+    def sample(name, labels, value):
+        if value is not None:
+            label_text = ",".join(f'{key}="{label}"' for key, label in labels.items())
+            lines.append(f"{PROMETHEUS_PREFIX}_{name}{{{label_text}}} {value}")
+
+    def eni_labels(metrics, **labels):
+        # Metrics of several DPUs in one file (multiMonitorBulker) carry the DPU they belong to
+        return {"dpu": metrics["dpu"], "eni": metrics["eni"], **labels} if "dpu" in metrics else {"eni": metrics["eni"], **labels}
+
+    family("enis_completed", "gauge", "ENIs whose CRM counters reached their cumulative threshold.")
+    dpus = [metrics["dpu"] for metrics in eni_metrics if "dpu" in metrics]
+    if dpus:
+        for dpu in sorted(set(dpus)):
+            sample("enis_completed", {"dpu": dpu}, dpus.count(dpu))
+    else:
+        lines.append(f"{PROMETHEUS_PREFIX}_enis_completed {len(eni_metrics)}")
+    family("eni_duration_seconds", "gauge", "Time from the previous ENI's completion to this one's.")
+    for metrics in eni_metrics:
+        sample("eni_duration_seconds", eni_labels(metrics), metrics["duration"])
+    family("eni_install_rate", "gauge", "Entries installed per second during the ENI, from the CRM counters.")
+    for metrics in eni_metrics:
+        for kind in ("routes", "mappings", "entries"):
+            sample("eni_install_rate", eni_labels(metrics, kind=kind), metrics[f"{kind}_per_sec"])
+    family("bulk_took_seconds", "summary", "Bulk 'took' times from syslog, per ENI.")
+    for metrics in eni_metrics:
+        took = metrics["took"]
+        for fraction in TOOK_QUANTILES:
+            sample("bulk_took_seconds", eni_labels(metrics, quantile=fraction), took[f"p{round(fraction * 100)}"])
+        sample("bulk_took_seconds_sum", eni_labels(metrics), took["sum"])
+        sample("bulk_took_seconds_count", eni_labels(metrics), took["count"])
+    family("bulk_took_seconds_max", "gauge", "Slowest bulk 'took' time per ENI.")
+    for metrics in eni_metrics:
+        sample("bulk_took_seconds_max", eni_labels(metrics), metrics["took"]["max"])
+
+    with open(path + ".tmp", "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(path + ".tmp", path)
+
+def print_progress(routes_delta, mappings_delta, args):
+    """Prints the rolling install rates and the ETAs of the ENI in progress and of the whole run."""
+    eni_index = g_eni_index
+    routes_rate, mappings_rate = g_series.rates(args.rate_window)
+    eni_routes, eni_mappings = get_expected_counts(eni_index, args)
+    run_routes, run_mappings = get_expected_counts(args.total_enis, args)
+    eni_eta = estimate_eta(eni_routes - routes_delta, eni_mappings - mappings_delta, routes_rate, mappings_rate)
+    run_eta = estimate_eta(run_routes - routes_delta, run_mappings - mappings_delta, routes_rate, mappings_rate)
+    rates = "unknown" if routes_rate is None else f"{routes_rate:.0f} routes/s, {mappings_rate:.0f} mappings/s"
+    print(f"[INFO] ENI {eni_index}: routes {routes_delta}/{eni_routes}, mappings {mappings_delta}/{eni_mappings} | "
+          f"{rates} | ETA ENI {format_eta(eni_eta)}, run {format_eta(run_eta)}")
+
+def get_poll_delay(routes_delta, mappings_delta, args):
+    """Seconds to wait before the next counter read: fixed, or with --adaptive half the current ENI's ETA, so reads
+    are rare early in an install and close in on its completion."""
+    if not args.adaptive:
+        return args.poll_interval
+    routes_rate, mappings_rate = g_series.rates(args.rate_window)
+    expected_routes, expected_mappings = get_expected_counts(g_eni_index, args)
+    eta = estimate_eta(expected_routes - routes_delta, expected_mappings - mappings_delta, routes_rate, mappings_rate)
+    if eta is None:
+        return args.poll_interval # No install rate yet (or the counters are not moving)
+    return min(args.max_poll_interval, max(args.min_poll_interval, eta / 2))
 
 def handle_sigint(sig, frame):
     """Handles Ctrl+C for a graceful exit."""
     print("\n[INFO] Ctrl+C received. Exiting...")
-    if g_process and g_process.poll() is None:
-        g_process.terminate()
+    restore_keyspace_events()
+    if g_log_writer is not None:
+        g_log_writer.close() # Don't lose the lines still queued
+    if g_series is not None and g_series_file:
+        g_series.save(g_series_file)
     sys.exit(0)
 
+def restore_keyspace_events():
+    """Puts notify-keyspace-events back the way subscribe_crm_stats() found it; the setting is server-wide."""
+    global g_saved_keyspace_events
+    if g_saved_keyspace_events is None:
+        return
+    target, events = g_saved_keyspace_events
+    g_saved_keyspace_events = None
+    try:
+        connection = RedisConnection(**target)
+        try:
+            connection.execute("CONFIG", "SET", "notify-keyspace-events", events)
+        finally:
+            connection.close()
+    except (OSError, RedisError):
+        print(f"[WARN] Could not restore notify-keyspace-events to '{events}' on the DPU's Redis.")
+
+def subscribe_crm_stats(target):
+    """Subscribes a new connection to keyspace notifications for CRM:STATS; returns None if Redis won't send them."""
+    global g_saved_keyspace_events
+    try:
+        connection = RedisConnection(**target)
+    except OSError:
+        return None
+    try:
+        # Hash writes only notify with K (keyspace) plus h (hash) or A (all) enabled; add just what is missing,
+        # and put the original back on exit since every other client of this Redis server sees the setting too
+        events = connection.execute("CONFIG", "GET", "notify-keyspace-events")[1].decode()
+        missing = ("" if "K" in events else "K") + ("" if "h" in events or "A" in events else "h")
+        if missing:
+            connection.execute("CONFIG", "SET", "notify-keyspace-events", events + missing)
+            g_saved_keyspace_events = target, events
+            atexit.register(restore_keyspace_events) # Also runs on the sys.exit() of handle_sigint() and stall aborts
+    except (RedisError, IndexError):
+        pass # CONFIG may be disabled; notifications can still be on, and the poll interval bounds each wait anyway
+    try:
+        connection.execute("SUBSCRIBE", f"__keyspace@{target['db']}__:{CRM_STATS_KEY}")
+    except (OSError, RedisError):
+        connection.close()
+        return None
+    return connection
+
+def wait_for_crm_change(timeout):
+    """Sleeps until CRM:STATS is written or timeout seconds pass; without a subscription, just sleeps."""
+    global g_crm_events
+    if g_crm_events is None:
+        time.sleep(timeout)
+        return
+    try:
+        if g_crm_events.has_reply(timeout):
+            g_crm_events.read_reply()
+            # Consume the whole burst that queued up meanwhile: the next counter read covers all of it, and
+            # each message left behind would end a later wait at once for a change already seen
+            while g_crm_events.has_reply(0):
+                g_crm_events.read_reply()
+    except (OSError, RedisError):
+        print("[WARN] Lost the CRM:STATS subscription; falling back to polling.")
+        g_crm_events.close()
+        g_crm_events = None
+
 def get_crm_counts():
     """Fetches current CRM counters from the SONiC database."""
+    global g_counters_db
+    if g_counters_db_target is not None:
+        try:
+            if g_counters_db is None:
+                g_counters_db = RedisConnection(**g_counters_db_target)
+            # Both counters in one round trip on a connection kept open across polls
+            crm_routes, crm_mappings = g_counters_db.execute("HMGET", CRM_STATS_KEY, CRM_ROUTES_FIELD, CRM_MAPPINGS_FIELD)
+            if crm_routes is None or crm_mappings is None:
+                return None, None
+            return int(crm_routes), int(crm_mappings)
+        except (OSError, RedisError, ValueError):
+            # Socket gone or DB restarting: drop the connection and answer from the CLI this time
+            if g_counters_db is not None:
+                g_counters_db.close()
+                g_counters_db = None
+    return get_crm_counts_cli()
+
+def get_crm_counts_cli():
+    """Fetches current CRM counters with two sonic-db-cli calls; the fallback when Redis is unreachable."""
     try:
         crm_routes = int(subprocess.check_output(
             "sonic-db-cli COUNTERS_DB HGET 'CRM:STATS' 'crm_stats_dash_ipv4_outbound_routing_used'",
@@ -65,14 +652,84 @@ def get_crm_counts():
         # In a polling script, we expect some failures, so keep this quiet
         return None, None
 
-def write_log(file_path, line):
-    """Appends a line of text to a specified log file."""
+class LogWriter:
+    """Appends lines to log files from a background thread, batching them into few large writes."""
+
+    def __init__(self, queue_size=LOG_QUEUE_SIZE, flush_bytes=LOG_FLUSH_BYTES, flush_interval=LOG_FLUSH_INTERVAL):
+        self.queue = queue.Queue(queue_size)
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.files = {}
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, file_path, line, urgent=False):
+        """Queues line for file_path; urgent lines are written out (with everything before them) right away."""
+        self.queue.put((file_path, line, urgent))
+
+    def call_after_write(self, callback):
+        """Runs callback on the writer thread once everything queued before it is written and synced to disk."""
+        self.queue.put((None, callback, True))
+
+    def close(self):
+        """Writes out everything queued so far and stops the thread."""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def run(self):
+        pending = {}
+        pending_bytes = 0
+        deadline = None
+        while True:
+            try:
+                item = self.queue.get(timeout=None if deadline is None else max(0.0, deadline - time.time()))
+            except queue.Empty:
+                item = False # Flush deadline reached
+            callback = None
+            if item:
+                file_path, line, urgent = item
+                if file_path is None:
+                    callback = line
+                else:
+                    pending.setdefault(file_path, []).append(line)
+                    pending_bytes += len(line)
+                    if deadline is None:
+                        deadline = time.time() + self.flush_interval
+            if item is None or item is False or urgent or pending_bytes >= self.flush_bytes:
+                self.flush(pending, sync=callback is not None)
+                pending = {}
+                pending_bytes = 0
+                deadline = None
+            if callback is not None:
+                callback()
+            if item is None:
+                for f in self.files.values():
+                    f.close()
+                return
+
+    def flush(self, pending, sync=False):
+        for file_path, lines in pending.items():
+            f = self.files.get(file_path)
+            if f is None:
+                f = self.files[file_path] = open(file_path, "a")
+            f.writelines(lines)
+            f.flush()
+        if sync:
+            for f in self.files.values():
+                os.fsync(f.fileno())
+
+def write_log(file_path, line, urgent=False):
+    """Appends a line of text to a specified log file, through the background writer while there is one."""
+    if g_log_writer is not None:
+        g_log_writer.write(file_path, line, urgent)
+        return
     with open(file_path, "a") as f:
         f.write(line)
 
 def main():
     """Main function to run the monitoring process."""
-    global g_bulker_time_sum, g_eni_index
+    global g_eni_index, g_active_eni, g_counters_db_target, g_crm_events, g_log_writer, g_series, g_series_file
 
     parser = argparse.ArgumentParser(
         description="Polls CRM counters to monitor ENI processing on a SONiC device.",
@@ -81,42 +738,126 @@ def main():
     parser.add_argument('-r', '--routes', type=int, default=100000, help="Routes per ENI.")
     parser.add_argument('-m', '--mappings', type=int, default=125000, help="Mappings per ENI.")
     parser.add_argument('-t', '--total-enis', type=int, default=64, help="Total ENIs to monitor.")
+    parser.add_argument('--num-vnets', type=int, default=1024,
+                        help="VNETs shared by the ENIs; ENIs past this count reuse a VNET and add no mappings.")
     parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds between counter checks.")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="Wait half the current ENI's estimated remaining time between counter checks, within "
+                             "--min/--max-poll-interval; --poll-interval is used until there is an install rate.")
+    parser.add_argument('--min-poll-interval', type=float, default=0.05, help="Shortest wait with --adaptive.")
+    parser.add_argument('--max-poll-interval', type=float, default=10.0, help="Longest wait with --adaptive.")
+    parser.add_argument('--redis-socket', help="COUNTERS_DB unix socket (default: from database_config.json).")
+    parser.add_argument('--redis-host', help="COUNTERS_DB TCP host, used instead of the unix socket.")
+    parser.add_argument('--redis-port', type=int, default=6379, help="COUNTERS_DB TCP port, with --redis-host.")
+    parser.add_argument('--counters-db', type=int, help="COUNTERS_DB database number (default: from database_config.json).")
+    parser.add_argument('--use-cli', action='store_true', help="Always read counters through sonic-db-cli.")
+    parser.add_argument('--syslog', default=SYSLOG_FILE, help="Syslog file to follow for bulker 'Ram Test' lines.")
+    parser.add_argument('--checkpoint', default=SYSLOG_CHECKPOINT_FILE,
+                        help="File recording how far the syslog has been read.")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue a stopped run: keep the existing logs, carry on after the last ENI in the summary "
+                             "log with the run's CRM baseline from --state-file, and resume the syslog from --checkpoint.")
+    parser.add_argument('--state-file', default=RUN_STATE_FILE, help="File recording the run's CRM baseline, for --resume.")
+    parser.add_argument('--eni-pattern', default=r"eni(\d+)",
+                        help="Regex whose first group is the ENI of a 'Ram Test' line; lines without a match (or all "
+                             "lines, if empty) are attributed to the ENI being installed per the counters.")
+    parser.add_argument('--metrics-file', default="eni_metrics.jsonl",
+                        help="JSON lines file getting each ENI's took-time distribution and install rates.")
+    parser.add_argument('--prom-textfile',
+                        help="Also keep these metrics in a Prometheus textfile, e.g. for node_exporter's textfile collector.")
+    parser.add_argument('--series-file', default="crm_series.csv",
+                        help="CSV file getting every counter read (timestamp, routes used, mappings used) on exit.")
+    parser.add_argument('--rate-window', type=float, default=30.0, help="Seconds of counter reads behind rates and ETAs.")
+    parser.add_argument('--progress-interval', type=float, default=30.0,
+                        help="Seconds between progress lines with install rates and ETAs (0 = only on completions).")
+    parser.add_argument('--stall-timeout', type=float, default=0.0,
+                        help="Warn when the counters have not moved for this many seconds, once installing has "
+                             "started (0 = never).")
+    parser.add_argument('--stall-abort', action='store_true', help="Exit with an error on a stall instead of warning.")
+    parser.add_argument('--events', action='store_true',
+                        help="Re-check the counters when CRM:STATS changes (Redis keyspace notifications) instead of "
+                             "on every poll; --poll-interval then only bounds the wait between checks.")
     args = parser.parse_args()
 
     # --- Setup ---
     signal.signal(signal.SIGINT, handle_sigint)
+    if not args.use_cli:
+        g_counters_db_target = find_counters_db() or {"unix_socket": None, "host": "127.0.0.1", "port": 6379, "db": 2}
+        if args.redis_socket or args.redis_host:
+            g_counters_db_target.update(unix_socket=args.redis_socket, host=args.redis_host or "127.0.0.1", port=args.redis_port)
+        if args.counters_db is not None:
+            g_counters_db_target["db"] = args.counters_db
     ram_log_file = "ram_test.log"
     summary_log_file = "eni_summary.log"
     took_time_re = re.compile(r"took ([0-9.]+) seconds$")
+    eni_re = re.compile(args.eni_pattern) if args.eni_pattern else None
     
-    for f in [ram_log_file, summary_log_file]:
+    for f in ([] if args.resume else [ram_log_file, summary_log_file, args.metrics_file]):
         try:
             os.remove(f)
         except FileNotFoundError:
             pass
+    reported_took_counts = {} # ENI -> number of "took" times included in its summary line
+    eni_metrics = []
+    baseline = None
+    if args.resume:
+        baseline = load_run_state(args.state_file)
+        if baseline is None:
+            print(f"[ERROR] --resume needs the stopped run's CRM baseline in '{args.state_file}'. Exiting.")
+            sys.exit(1)
+        # Pick up where the logs end: the next ENI after the last COMPLETED line, with the "took" times seen so far
+        g_eni_index = get_completed_enis(summary_log_file) + 1
+        trim_log_to_checkpoint(ram_log_file, args.checkpoint)
+        g_took_times.update(load_took_times(ram_log_file, took_time_re))
+        reported_took_counts = {eni: len(times) for eni, times in g_took_times.items() if eni < g_eni_index}
+        eni_metrics = [metrics for metrics in load_eni_metrics(args.metrics_file) if metrics["eni"] < g_eni_index]
+        print(f"[INFO] Resuming at ENI {g_eni_index} from baseline Routes={baseline[0]}, Mappings={baseline[1]}.")
+    g_log_writer = LogWriter()
 
-    print(f"[INFO] Script started. Polling every {args.poll_interval} second(s).")
+    if args.adaptive:
+        print(f"[INFO] Script started. Polling adaptively every {args.min_poll_interval}-{args.max_poll_interval} second(s).")
+    else:
+        print(f"[INFO] Script started. Polling every {args.poll_interval} second(s).")
     print(f"[INFO] Monitoring for {args.total_enis} ENIs...")
     print(f"[INFO] Criteria per ENI: {args.routes} routes, {args.mappings} mappings.")
+    if g_counters_db_target is None:
+        print("[INFO] Reading CRM counters through sonic-db-cli.")
+    else:
+        location = g_counters_db_target["unix_socket"] or f"{g_counters_db_target['host']}:{g_counters_db_target['port']}"
+        print(f"[INFO] Reading CRM counters from Redis at {location} (db {g_counters_db_target['db']}), "
+              f"falling back to sonic-db-cli.")
+    if args.events:
+        g_crm_events = subscribe_crm_stats(g_counters_db_target) if g_counters_db_target is not None else None
+        if g_crm_events is None:
+            print("[WARN] Could not subscribe to CRM:STATS changes; polling instead.")
+        else:
+            print(f"[INFO] Re-checking counters when CRM:STATS changes, at least every {args.poll_interval} second(s).")
 
     # --- Start background thread for log monitoring ---
     log_thread = threading.Thread(
         target=log_monitor_worker,
-        args=(ram_log_file, took_time_re),
+        args=(ram_log_file, took_time_re, eni_re, args.syslog, args.checkpoint, args.resume),
         daemon=True  # Allows main script to exit even if this thread is blocked
     )
     log_thread.start()
     print("[INFO] Background log monitor started.")
 
     # --- Main Polling Loop ---
-    initial_routes_base, initial_mappings_base = get_crm_counts()
-    if initial_routes_base is None:
+    total_crm_routes, total_crm_mappings = get_crm_counts()
+    if total_crm_routes is None:
         print("[ERROR] Could not get initial CRM counts. Exiting.")
         sys.exit(1)
-    
-    print(f"[INFO] Initial baseline counts read: Routes={initial_routes_base}, Mappings={initial_mappings_base}")
+    if baseline is None:
+        baseline = total_crm_routes, total_crm_mappings
+        save_run_state(args.state_file, *baseline)
+        print(f"[INFO] Initial baseline counts read: Routes={baseline[0]}, Mappings={baseline[1]}")
+    initial_routes_base, initial_mappings_base = baseline
     eni_start_time = time.time()
+    g_series = CounterSeries()
+    g_series_file = args.series_file
+    g_series.append(eni_start_time, total_crm_routes, total_crm_mappings)
+    last_progress_time = eni_start_time
+    stall_reported = False
 
     while g_eni_index <= args.total_enis:
         total_crm_routes, total_crm_mappings = get_crm_counts()
@@ -124,35 +865,79 @@ def main():
             time.sleep(args.poll_interval)
             continue # If DB read fails, just wait and try again
 
+        now = time.time()
+        g_series.append(now, total_crm_routes, total_crm_mappings)
         routes_delta_total = total_crm_routes - initial_routes_base
         mappings_delta_total = total_crm_mappings - initial_mappings_base
-        expected_routes_cumulative = args.routes * g_eni_index
-        expected_mappings_cumulative = args.mappings * g_eni_index
+        g_active_eni = get_active_eni(routes_delta_total, mappings_delta_total, args)
+
+        # Stall detection starts with the first counter movement, so a run waiting for its first push is not a stall
+        if args.stall_timeout and g_series.last_change is not None:
+            stalled_for = now - g_series.last_change
+            if stalled_for < args.stall_timeout:
+                stall_reported = False
+            elif not stall_reported:
+                stall_reported = True
+                print(f"\n[WARN] CRM counters have not moved for {stalled_for:.0f}s while waiting for ENI {g_eni_index} "
+                      f"(routes {routes_delta_total}, mappings {mappings_delta_total}).")
+                write_log(summary_log_file, f"ENI {g_eni_index} STALLED {stalled_for:.2f}\n", urgent=True)
+                if args.stall_abort:
+                    print("[ERROR] Aborting on stall.")
+                    g_log_writer.close()
+                    g_series.save(g_series_file)
+                    sys.exit(2)
+
+        if args.progress_interval and now - last_progress_time >= args.progress_interval:
+            last_progress_time = now
+            print_progress(routes_delta_total, mappings_delta_total, args)
 
-        if routes_delta_total >= expected_routes_cumulative and mappings_delta_total >= expected_mappings_cumulative:
-            duration = time.time() - eni_start_time
-            
+        # Close out every ENI whose cumulative threshold has been crossed, not just one per poll
+        completed_enis = []
+        for eni in range(g_eni_index, args.total_enis + 1):
+            expected_routes_cumulative, expected_mappings_cumulative = get_expected_counts(eni, args)
+            if routes_delta_total < expected_routes_cumulative or mappings_delta_total < expected_mappings_cumulative:
+                break
+            completed_enis.append(eni)
+        durations = split_duration(time.time() - eni_start_time, completed_enis, args) if completed_enis else []
+        for duration in durations:
             with g_lock:
-                # Safely read and then reset the shared time sum
-                current_bulker_sum = g_bulker_time_sum
-                g_bulker_time_sum = 0.0
+                # Safely read what has been attributed to this ENI so far
+                took_times = list(g_took_times.get(g_eni_index, []))
+            current_bulker_sum = sum(took_times)
+            reported_took_counts[g_eni_index] = len(took_times)
 
             # Log completion
             summary_line = f"ENI {g_eni_index} COMPLETED {duration:.2f} {current_bulker_sum:.3f}\n"
-            write_log(summary_log_file, summary_line)
+            write_log(summary_log_file, summary_line, urgent=True) # apply_configs.sh waits on these lines
             print(f"\n[SUCCESS] ENI {g_eni_index} completed. Processing Time: {duration:.2f}s | Bulk 'took' Time: {current_bulker_sum:.3f}s")
+            metrics = build_eni_metrics(g_eni_index, duration, took_times, args)
+            eni_metrics.append(metrics)
+            write_log(args.metrics_file, json.dumps(metrics) + "\n")
+            if args.prom_textfile:
+                write_prometheus_textfile(args.prom_textfile, eni_metrics)
 
             # Move to next ENI
             g_eni_index += 1
             if g_eni_index <= args.total_enis:
                 print(f"[INFO] Now monitoring for ENI {g_eni_index}...")
-                eni_start_time = time.time() # Reset timer for the new ENI
+                print_progress(routes_delta_total, mappings_delta_total, args)
+        if completed_enis:
+            eni_start_time = time.time() # Reset timer for the new ENI
+            continue # Re-read right away: a finished ENI is a good moment to catch up on the next one
 
-        time.sleep(args.poll_interval)
+        wait_for_crm_change(get_poll_delay(routes_delta_total, mappings_delta_total, args))
 
     print("\n[INFO] All ENIs processed. Script finished.")
-    if g_process and g_process.poll() is None:
-        g_process.terminate()
+    g_series.save(g_series_file)
+    with g_lock:
+        for eni, count in sorted(reported_took_counts.items()):
+            late = g_took_times.get(eni, [])[count:]
+            if late:
+                print(f"[INFO] ENI {eni}: {len(late)} 'took' time(s), {sum(late):.3f}s in total, arrived after its summary.")
+    if g_crm_events is not None:
+        g_crm_events.close()
+    restore_keyspace_events()
+    g_log_writer.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,363 @@
+import argparse
+import asyncio
+import functools
+import json
+import os
+import re
+import time
+
+from monitorBulker import (
+    CRM_MAPPINGS_FIELD, CRM_ROUTES_FIELD, CRM_STATS_KEY, LogWriter, RedisError, SyslogFollower, build_eni_metrics,
+    encode_command, get_active_eni, get_completed_enis, get_expected_counts, load_eni_metrics, load_run_state,
+    load_took_times, parse_ram_test_line, save_checkpoint, save_run_state, split_duration, trim_log_to_checkpoint,
+    write_prometheus_textfile
+)
+
+# --- Defaults for DPU targets ---
+DEFAULT_REDIS_PORT = 6379
+DEFAULT_COUNTERS_DB = 2
+MERGED_SUMMARY_FILE = "eni_summary_all.log"
+SYSLOG_IDLE_INTERVAL = 0.2
+
+class AsyncRedisConnection:
+    """A minimal asyncio Redis (RESP2) client, the counterpart of monitorBulker.RedisConnection."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, unix_socket=None, host="127.0.0.1", port=DEFAULT_REDIS_PORT, db=0, timeout=2.0):
+        if unix_socket:
+            reader, writer = await asyncio.wait_for(asyncio.open_unix_connection(unix_socket), timeout)
+        else:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        connection = cls(reader, writer)
+        if db:
+            await asyncio.wait_for(connection.execute("SELECT", db), timeout)
+        return connection
+
+    async def execute(self, *args):
+        """Sends one command and returns its decoded reply (bytes, int, list or None)."""
+        self.writer.write(encode_command(*args))
+        await self.writer.drain()
+        return await self.read_reply()
+
+    async def read_reply(self):
+        line = await self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Redis connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload
+        if kind == b"-":
+            raise RedisError(payload.decode(errors="replace"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            if int(payload) < 0:
+                return None
+            return (await self.reader.readexactly(int(payload) + 2))[:-2]
+        if kind == b"*":
+            if int(payload) < 0:
+                return None
+            return [await self.read_reply() for _ in range(int(payload))]
+        raise RedisError(f"Unexpected reply {line!r}")
+
+    def close(self):
+        self.writer.close()
+
+def parse_target(spec):
+    """
+    Parses a --dpu spec such as "name=dpu0,redis=169.254.200.1:6379,db=2,syslog=/var/log/dpu0/syslog".
+    redis is host[:port] or a unix socket path (anything with a "/"); db defaults to COUNTERS_DB's usual 2.
+    """
+    target = {}
+    for item in spec.split(","):
+        key, sep, value = item.partition("=")
+        if not sep or not value:
+            raise argparse.ArgumentTypeError(f"Expected key=value items, got {item!r} in {spec!r}")
+        target[key.strip()] = value.strip()
+    return normalize_target(target)
+
+def normalize_target(target):
+    """Checks a target dict (from --dpu or --targets) and fills in the Redis connection arguments."""
+    for key in ("name", "redis", "syslog"):
+        if not target.get(key):
+            raise argparse.ArgumentTypeError(f"DPU target {target} needs a {key}")
+    unknown = set(target) - {"name", "redis", "db", "syslog"}
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown key(s) {', '.join(sorted(unknown))} in DPU target {target}")
+    redis = str(target["redis"])
+    try:
+        if "/" in redis:
+            connection = {"unix_socket": redis, "host": None, "port": None}
+        else:
+            host, _, port = redis.partition(":")
+            connection = {"unix_socket": None, "host": host, "port": int(port) if port else DEFAULT_REDIS_PORT}
+        connection["db"] = int(target.get("db", DEFAULT_COUNTERS_DB))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Bad redis port or db in DPU target {target}")
+    return {"name": target["name"], "redis": connection, "syslog": target["syslog"]}
+
+def load_targets(path):
+    """Reads a JSON list of DPU targets, each an object with the same keys as a --dpu spec."""
+    with open(path) as f:
+        targets = json.load(f)
+    if not isinstance(targets, list):
+        raise argparse.ArgumentTypeError(f"{path} must hold a JSON list of DPU targets")
+    return [normalize_target(target) for target in targets]
+
+class DpuMonitor:
+    """Follows one DPU's CRM counters and syslog, with the state monitorBulker keeps in its globals."""
+
+    def __init__(self, target, args, log_writer, monitors):
+        self.name = target["name"]
+        self.redis_target = target["redis"]
+        self.syslog_file = target["syslog"]
+        self.args = args
+        self.log_writer = log_writer
+        self.monitors = monitors # Every DPU's monitor, this one included, for the shared Prometheus textfile
+        prefix = os.path.join(args.output_dir, self.name)
+        self.ram_log_file = f"{prefix}_ram_test.log"
+        self.summary_log_file = f"{prefix}_eni_summary.log"
+        self.metrics_file = f"{prefix}_eni_metrics.jsonl"
+        self.checkpoint_file = f"{prefix}_syslog_checkpoint.json"
+        self.state_file = f"{prefix}_monitor_state.json"
+        self.merged_summary_file = os.path.join(args.output_dir, MERGED_SUMMARY_FILE)
+        self.took_times = {} # ENI -> bulk "took" times attributed to it
+        self.eni_index = 1 # Next ENI to complete
+        self.active_eni = 1
+        self.connection = None
+        self.started = None
+        self.finished = None
+        self.eni_metrics = []
+        self.baseline = None # CRM counts the cumulative thresholds are measured from
+
+    def restore(self, took_time_re):
+        """Picks a stopped run back up from this DPU's state file and logs; returns False without a state file."""
+        self.baseline = load_run_state(self.state_file)
+        if self.baseline is None:
+            return False
+        self.eni_index = get_completed_enis(self.summary_log_file) + 1
+        trim_log_to_checkpoint(self.ram_log_file, self.checkpoint_file)
+        self.took_times = load_took_times(self.ram_log_file, took_time_re)
+        self.eni_metrics = [metrics for metrics in load_eni_metrics(self.metrics_file) if metrics["eni"] < self.eni_index]
+        return True
+
+    def remove_logs(self):
+        for f in (self.ram_log_file, self.summary_log_file, self.metrics_file):
+            try:
+                os.remove(f)
+            except FileNotFoundError:
+                pass
+
+    async def get_crm_counts(self):
+        """Both CRM counters in one HMGET, or (None, None) while the DPU's Redis is unreachable."""
+        try:
+            if self.connection is None:
+                self.connection = await AsyncRedisConnection.connect(**self.redis_target)
+            crm_routes, crm_mappings = await asyncio.wait_for(
+                self.connection.execute("HMGET", CRM_STATS_KEY, CRM_ROUTES_FIELD, CRM_MAPPINGS_FIELD), 2.0)
+            if crm_routes is None or crm_mappings is None:
+                return None, None
+            return int(crm_routes), int(crm_mappings)
+        except (OSError, RedisError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+            return None, None
+
+    async def follow_log(self, took_time_re, eni_re):
+        """Attributes this DPU's "Ram Test" lines to ENIs, like monitorBulker.log_monitor_worker()."""
+        follower = SyslogFollower(self.syslog_file, self.checkpoint_file, self.args.resume)
+        try:
+            while True:
+                # Off the event loop, so a large backlog does not hold up the other DPUs' counter polling
+                lines = await asyncio.to_thread(follower.read_lines)
+                if lines is None:
+                    await asyncio.sleep(SYSLOG_IDLE_INTERVAL)
+                    continue
+                for raw_line in lines:
+                    line, took_time, line_eni = parse_ram_test_line(raw_line, took_time_re, eni_re)
+                    eni = line_eni if line_eni is not None else self.active_eni
+                    self.log_writer.write(self.ram_log_file, f"[ENI {eni}] {line}\n")
+                    if took_time is not None:
+                        self.took_times.setdefault(eni, []).append(took_time)
+                position = follower.take_checkpoint()
+                if position is not None:
+                    self.log_writer.call_after_write(functools.partial(save_checkpoint, self.checkpoint_file, *position, self.ram_log_file))
+        finally:
+            follower.close()
+
+    async def poll_counters(self):
+        """Closes out this DPU's ENIs as its cumulative CRM thresholds are crossed."""
+        args = self.args
+        if self.baseline is None:
+            self.baseline = await self.get_crm_counts()
+            while self.baseline[0] is None:
+                print(f"[WARN] {self.name}: could not get initial CRM counts, retrying.")
+                await asyncio.sleep(args.poll_interval)
+                self.baseline = await self.get_crm_counts()
+            save_run_state(self.state_file, *self.baseline)
+            print(f"[INFO] {self.name}: initial baseline counts read: Routes={self.baseline[0]}, Mappings={self.baseline[1]}")
+        else:
+            print(f"[INFO] {self.name}: resuming at ENI {self.eni_index} from baseline Routes={self.baseline[0]}, "
+                  f"Mappings={self.baseline[1]}")
+        initial_routes_base, initial_mappings_base = self.baseline
+        self.started = eni_start_time = time.time()
+
+        while self.eni_index <= args.total_enis:
+            total_crm_routes, total_crm_mappings = await self.get_crm_counts()
+            if total_crm_routes is None:
+                await asyncio.sleep(args.poll_interval)
+                continue
+            routes_delta_total = total_crm_routes - initial_routes_base
+            mappings_delta_total = total_crm_mappings - initial_mappings_base
+            self.active_eni = get_active_eni(routes_delta_total, mappings_delta_total, args)
+
+            completed_enis = []
+            for eni in range(self.eni_index, args.total_enis + 1):
+                expected_routes_cumulative, expected_mappings_cumulative = get_expected_counts(eni, args)
+                if routes_delta_total < expected_routes_cumulative or mappings_delta_total < expected_mappings_cumulative:
+                    break
+                completed_enis.append(eni)
+            durations = split_duration(time.time() - eni_start_time, completed_enis, args) if completed_enis else []
+            for duration in durations:
+                took_times = list(self.took_times.get(self.eni_index, []))
+                current_bulker_sum = sum(took_times)
+
+                summary = f"ENI {self.eni_index} COMPLETED {duration:.2f} {current_bulker_sum:.3f}\n"
+                self.log_writer.write(self.summary_log_file, summary, urgent=True)
+                self.log_writer.write(self.merged_summary_file, f"{self.name} {summary}", urgent=True)
+                print(f"[SUCCESS] {self.name}: ENI {self.eni_index} completed. Processing Time: {duration:.2f}s | "
+                      f"Bulk 'took' Time: {current_bulker_sum:.3f}s")
+                metrics = build_eni_metrics(self.eni_index, duration, took_times, args)
+                metrics["dpu"] = self.name
+                self.eni_metrics.append(metrics)
+                self.log_writer.write(self.metrics_file, json.dumps(metrics) + "\n")
+                if args.prom_textfile:
+                    write_prometheus_textfile(args.prom_textfile, get_all_metrics(self.monitors))
+
+                self.eni_index += 1
+            if completed_enis:
+                eni_start_time = time.time()
+                continue
+            await asyncio.sleep(args.poll_interval)
+        self.finished = time.time()
+
+    async def run(self, took_time_re, eni_re):
+        log_task = asyncio.create_task(self.follow_log(took_time_re, eni_re))
+        try:
+            await self.poll_counters()
+            # Let "took" lines logged just before the last completion land in the ram log
+            await asyncio.sleep(SYSLOG_IDLE_INTERVAL)
+        finally:
+            log_task.cancel()
+            if self.connection is not None:
+                self.connection.close()
+
+def get_all_metrics(monitors):
+    """The metrics of every completed ENI, across all DPUs."""
+    return [metrics for monitor in monitors for metrics in monitor.eni_metrics]
+
+def print_merged_summary(monitors, args):
+    """Per-DPU totals at the end of a run, also appended to the merged summary file."""
+    lines = []
+    for monitor in monitors:
+        completed = monitor.eni_index - 1
+        took_sum = sum(sum(times) for times in monitor.took_times.values())
+        if monitor.started is None:
+            lines.append(f"{monitor.name} NOT STARTED")
+            continue
+        elapsed = (monitor.finished or time.time()) - monitor.started
+        state = "FINISHED" if completed >= args.total_enis else "INCOMPLETE"
+        lines.append(f"{monitor.name} {state} {completed}/{args.total_enis} {elapsed:.2f} {took_sum:.3f}")
+    print("\n[INFO] Summary per DPU (ENIs completed, seconds, bulk 'took' seconds):")
+    for line in lines:
+        print(f"  {line}")
+    with open(os.path.join(args.output_dir, MERGED_SUMMARY_FILE), "a") as f:
+        f.writelines(line + "\n" for line in lines)
+
+async def monitor_all(monitors, took_time_re, eni_re):
+    await asyncio.gather(*(monitor.run(took_time_re, eni_re) for monitor in monitors))
+
+def main(argv=None):
+    """Monitors the ENI processing of several DPUs at once, from one process."""
+    parser = argparse.ArgumentParser(
+        description="Polls CRM counters and follows syslogs to monitor ENI processing on several DPUs concurrently.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument('--dpu', dest='targets', action='append', type=parse_target, default=[],
+                        help="A DPU to monitor, as name=NAME,redis=HOST[:PORT]|SOCKET[,db=N],syslog=PATH; repeatable.")
+    parser.add_argument('--targets', dest='targets_file',
+                        help="JSON file with a list of DPU targets, objects with the same keys as --dpu.")
+    parser.add_argument('-r', '--routes', type=int, default=100000, help="Routes per ENI.")
+    parser.add_argument('-m', '--mappings', type=int, default=125000, help="Mappings per ENI.")
+    parser.add_argument('-t', '--total-enis', type=int, default=64, help="Total ENIs to monitor on each DPU.")
+    parser.add_argument('--num-vnets', type=int, default=1024,
+                        help="VNETs shared by the ENIs; ENIs past this count reuse a VNET and add no mappings.")
+    parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds between counter checks, per DPU.")
+    parser.add_argument('--eni-pattern', default=r"eni(\d+)",
+                        help="Regex whose first group is the ENI of a 'Ram Test' line; lines without a match are "
+                             "attributed to the ENI being installed per that DPU's counters.")
+    parser.add_argument('--output-dir', default=".", help="Directory for the per-DPU and merged logs.")
+    parser.add_argument('--prom-textfile', help="Also keep all DPUs' metrics in one Prometheus textfile.")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue a stopped run: keep the existing logs, carry on after each DPU's last completed "
+                             "ENI with its saved CRM baseline, and resume each syslog from its checkpoint.")
+    args = parser.parse_args(argv)
+
+    targets = list(args.targets)
+    if args.targets_file:
+        try:
+            targets += load_targets(args.targets_file)
+        except (OSError, ValueError, argparse.ArgumentTypeError) as e:
+            parser.error(str(e))
+    if not targets:
+        parser.error("no DPU targets; give --dpu and/or --targets")
+    names = [target["name"] for target in targets]
+    if len(set(names)) != len(names):
+        parser.error("DPU target names must be unique")
+
+    # --- Setup ---
+    os.makedirs(args.output_dir, exist_ok=True)
+    log_writer = LogWriter()
+    monitors = []
+    monitors += [DpuMonitor(target, args, log_writer, monitors) for target in targets]
+    took_time_re = re.compile(r"took ([0-9.]+) seconds$")
+    eni_re = re.compile(args.eni_pattern) if args.eni_pattern else None
+    if args.resume:
+        missing = [monitor.name for monitor in monitors if not monitor.restore(took_time_re)]
+        if missing:
+            log_writer.close()
+            parser.error(f"--resume needs the stopped run's state files; none for {', '.join(missing)}")
+    else:
+        for monitor in monitors:
+            monitor.remove_logs()
+        try:
+            os.remove(os.path.join(args.output_dir, MERGED_SUMMARY_FILE))
+        except FileNotFoundError:
+            pass
+
+    print(f"[INFO] Script started. Polling every {args.poll_interval} second(s).")
+    print(f"[INFO] Monitoring {len(monitors)} DPU(s) for {args.total_enis} ENIs each...")
+    print(f"[INFO] Criteria per ENI: {args.routes} routes, {args.mappings} mappings.")
+    for monitor in monitors:
+        location = monitor.redis_target["unix_socket"] or f"{monitor.redis_target['host']}:{monitor.redis_target['port']}"
+        print(f"[INFO] {monitor.name}: CRM counters from Redis at {location} (db {monitor.redis_target['db']}), "
+              f"syslog {monitor.syslog_file}")
+
+    try:
+        asyncio.run(monitor_all(monitors, took_time_re, eni_re))
+        print("\n[INFO] All DPUs processed. Script finished.")
+    except KeyboardInterrupt:
+        print("\n[INFO] Script interrupted by user. Exiting.")
+    finally:
+        log_writer.close()
+        print_merged_summary(monitors, args)
+        if args.prom_textfile:
+            write_prometheus_textfile(args.prom_textfile, get_all_metrics(monitors))
+
+if __name__ == "__main__":
+    main()
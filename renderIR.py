@@ -0,0 +1,166 @@
+import argparse
+import array
+import json
+import mmap
+import struct
+import sys
+
+IR_MAGIC = b"DASHIR01"
+BATCH_SIZE = 65536
+WRITE_BUFFER_SIZE = 1 << 20
+
+# The text layouts of configCommon.py (GenerateConfig.py/GenerateConfig7.py); rendered output is byte-identical to theirs
+LAYOUTS = {
+    "json": {"indent": 2, "separators": (",", ": "), "prefix": "  ",
+             "open": "[\n", "separator": ",\n", "close": "\n]", "empty": "[]"},
+    "compact": {"indent": None, "separators": (",", ":"), "prefix": "",
+                "open": "[", "separator": ",", "close": "]", "empty": "[]"},
+    "ndjson": {"indent": None, "separators": (",", ":"), "prefix": "",
+               "open": "", "separator": "\n", "close": "\n", "empty": ""},
+}
+
+def render_config(config, layout):
+    """Renders one config as an element of a file of the given layout."""
+    text = json.dumps(config, indent=layout["indent"], separators=layout["separators"])
+    return layout["prefix"] + text.replace("\n", "\n" + layout["prefix"])
+
+def as_addresses(view):
+    """Views little-endian uint32 bytes as a sequence of ints, in place unless the host is big-endian."""
+    if sys.byteorder == "little":
+        return view.cast("I")
+    addresses = array.array("I", view)
+    addresses.byteswap()
+    return addresses
+
+def format_addresses(addresses):
+    return [f"{a >> 24}.{a >> 16 & 255}.{a >> 8 & 255}.{a & 255}" for a in addresses]
+
+class IrFile:
+    """
+    A generator 'ir' file, memory-mapped: a JSON header (either the initial "configs" or an ENI's
+    id, VNET, entry counts and element formats) followed by uint32 arrays of the route overlay,
+    mapping overlay and mapping underlay addresses, which are read straight out of the mapping.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(IR_MAGIC)] != IR_MAGIC:
+            self.map.close()
+            raise ValueError(f"{path} is not an IR file")
+        header_size, = struct.unpack_from("<I", self.map, len(IR_MAGIC))
+        offset = len(IR_MAGIC) + 4
+        self.header = json.loads(self.map[offset:offset + header_size])
+        offset += header_size
+        self.configs = self.header.get("configs")
+        self.routes = self.header.get("routes", 0)
+        self.mappings = self.header.get("mappings", 0)
+        if offset + 4 * (self.routes + 2 * self.mappings) != len(self.map):
+            self.map.close()
+            raise ValueError(f"{path} is truncated or does not match its header")
+        self.view = memoryview(self.map)
+        self.arrays = []
+        for count in (self.routes, self.mappings, self.mappings):
+            self.arrays.append(as_addresses(self.view[offset:offset + 4 * count]))
+            offset += 4 * count
+
+    def __len__(self):
+        """Number of entries, routes followed by mappings (or initial configs)."""
+        return len(self.configs) if self.configs is not None else self.routes + self.mappings
+
+    def compile_element(self, config_format, layout):
+        """Renders an element format once into a %-template and the address fields it takes, in order."""
+        text = render_config(config_format, layout).replace("%", "%%")
+        text = text.replace("{eni}", str(self.header["eni"])).replace("{vnet}", str(self.header["vnet"]))
+        fields = sorted((text.find("{%s}" % field), field) for field in ("overlay", "underlay") if "{%s}" % field in text)
+        for _, field in fields:
+            text = text.replace("{%s}" % field, "%s")
+        return text, [field for _, field in fields]
+
+    def iter_element_blocks(self, config_format, columns, start, stop, layout):
+        """Yields the elements [start, stop) of one table, BATCH_SIZE per block of text."""
+        element, fields = self.compile_element(config_format, layout)
+        for block_start in range(start, stop, BATCH_SIZE):
+            block_stop = min(block_start + BATCH_SIZE, stop)
+            rows = zip(*[format_addresses(columns[field][block_start:block_stop].tolist()) for field in fields])
+            yield layout["separator"].join([element % row for row in rows])
+
+    def iter_blocks(self, layout, start=0, stop=None):
+        """Yields the text of entries [start, stop), in blocks to be joined by the layout's separator."""
+        start, stop, _ = slice(start, stop).indices(len(self))
+        if self.configs is not None:
+            if start < stop:
+                yield layout["separator"].join(render_config(config, layout) for config in self.configs[start:stop])
+            return
+        route_overlays, mapping_overlays, mapping_underlays = self.arrays
+        if start < self.routes:
+            yield from self.iter_element_blocks(self.header["route_format"], {"overlay": route_overlays},
+                                                start, min(stop, self.routes), layout)
+        if stop > self.routes:
+            yield from self.iter_element_blocks(self.header["mapping_format"],
+                                                {"overlay": mapping_overlays, "underlay": mapping_underlays},
+                                                max(start, self.routes) - self.routes, stop - self.routes, layout)
+
+    def close(self):
+        # The casts pin the mapping, so they go first
+        for addresses in self.arrays:
+            if isinstance(addresses, memoryview):
+                addresses.release()
+        self.view.release()
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def write_blocks(f, blocks, layout):
+    """Frames blocks of elements as one complete file of the layout."""
+    first = True
+    for block in blocks:
+        if not block:
+            continue
+        f.write((layout["open"] if first else layout["separator"]).encode())
+        f.write(block.encode())
+        first = False
+    f.write((layout["empty"] if first else layout["close"]).encode())
+
+def render_file(path, out_path, output_format="json", start=0, stop=None):
+    """Renders entries [start, stop) of the IR file at path into out_path as a JSON file of the given layout."""
+    layout = LAYOUTS[output_format]
+    with IrFile(path) as ir, open(out_path, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+        write_blocks(f, ir.iter_blocks(layout, start, stop), layout)
+    return out_path
+
+def main(argv=None):
+    """Renders an IR config file, or a range of its entries, as JSON."""
+    parser = argparse.ArgumentParser(
+        description="Renders a config written with --format ir by GenerateConfig.py/GenerateConfig7.py as JSON.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument('ir_file', metavar='IR_FILE')
+    parser.add_argument('-o', '--output', help="Output file (default: standard output).")
+    parser.add_argument('--format', choices=sorted(LAYOUTS), default="json", help="Layout of the rendered file.")
+    parser.add_argument('--start', type=int, default=0, help="First entry to render (routes come before mappings).")
+    parser.add_argument('--stop', type=int, help="Entry to stop before (default: the end of the file).")
+    parser.add_argument('--info', action='store_true', help="Print the file's ENI, VNET and entry counts instead.")
+    args = parser.parse_args(argv)
+
+    if args.info:
+        with IrFile(args.ir_file) as ir:
+            info = {key: value for key, value in ir.header.items() if not key.endswith("_format")}
+            if ir.configs is not None:
+                info["configs"] = len(ir.configs)
+            print(json.dumps(info))
+        return
+    if args.output:
+        render_file(args.ir_file, args.output, args.format, args.start, args.stop)
+        return
+    layout = LAYOUTS[args.format]
+    with IrFile(args.ir_file) as ir:
+        write_blocks(sys.stdout.buffer, ir.iter_blocks(layout, args.start, args.stop), layout)
+
+if __name__ == '__main__':
+    main()